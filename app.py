@@ -1,20 +1,690 @@
-from flask import Flask, jsonify
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup, SoupStrainer
+from datetime import datetime, timezone, timedelta
 import re
+import os
 import json
 import time
+import hashlib
+import gzip
 import argparse
+import contextlib
+import threading
+import sys
+import bisect
+import itertools
+import sqlite3
+import queue
+import random
+import codecs
+import mmap
+import multiprocessing
+from html import escape as html_escape
+from html.parser import HTMLParser
+from collections import deque
+from urllib.parse import urlencode, urlsplit
+from urllib.request import pathname2url
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 
 # 通用配置
-MAX_VERSIONS = 10
+MAX_VERSIONS = 10  # 接口只返回最近的版本数，None 表示不限制
+CACHE_TTL = 600  # 缓存有效期（秒），过期后仍返回旧数据并在后台刷新
+ALL_DEADLINE = 20  # /api/all 中每个游戏的最长等待时间（秒）
+ALL_MAX_WORKERS = 6  # /api/all 并发抓取的线程数上限
+SERVE_SNAPSHOTS = False  # 为 True 时直接返回已提交的 gacha_data.json，不访问网络
+SNAPSHOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-app = Flask(__name__)
-app.config['JSON_SORT_KEYS'] = False
+# 维基抓取配置（可通过环境变量指向本地测试服务器）
+WIKI_BASE_URL = os.environ.get('GACHA_WIKI_BASE_URL', "https://wiki.biligame.com").rstrip('/')
+PAGE_CACHE_DIR = os.environ.get('GACHA_PAGE_CACHE_DIR', os.path.join(SNAPSHOT_DIR, ".page_cache"))
+REQUEST_TIMEOUT = 30  # 单次读取超时（秒）
+CONNECT_TIMEOUT = 5  # 建立连接的超时（秒）
+FETCH_DEADLINE = 60  # 单次请求（含下载正文）的总时长上限（秒），防止慢速响应一直占住刷新线程
+FETCH_RETRIES = 2  # 连接错误、超时和 5xx/429 时的重试次数
+RETRY_BACKOFF = 1.0  # 重试退避的基准时间（秒），每次翻倍并加随机抖动
+RETRY_BACKOFF_MAX = 10.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+CIRCUIT_FAILURE_THRESHOLD = 5  # 同一主机连续失败次数达到此值时熔断
+CIRCUIT_RESET_TIMEOUT = 120  # 熔断后经过此时间（秒）放行一次试探请求
+HTML_PARSER = os.environ.get('GACHA_HTML_PARSER', "auto")  # auto / lxml / html.parser
+# 原神往期祈愿页面并行解析的进程数，0 表示按 CPU 核数，1 表示在当前进程串行解析
+PARSE_WORKERS = int(os.environ.get('GACHA_PARSE_WORKERS', "0"))
+PARSE_PARALLEL_MIN_BYTES = 1 << 20  # 页面小于此大小时串行解析，并行的收益抵不上进程间传输的开销
+# 历史卡池数据库，设为空字符串时不写入
+HISTORY_DB_PATH = os.environ.get('GACHA_HISTORY_DB', os.path.join(SNAPSHOT_DIR, "gacha_history.db"))
+HISTORY_DB_READONLY = False  # 为 True 时只查询不写入（多进程部署时由主进程写入）
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+GENSHIN_HISTORY_PATH = "/ys/往期祈愿"
+GENSHIN_CHRONICLED_PATH = "/ys/集录祈愿"
+HSR_HISTORY_PATH = "/sr/%E5%8E%86%E5%8F%B2%E8%B7%83%E8%BF%81"
+ZZZ_HISTORY_PATH = "/zzz/%E5%BE%80%E6%9C%9F%E8%B0%83%E9%A2%91"
+
+try:
+    import lxml  # noqa: F401  可选依赖，安装后解析速度更快
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+try:
+    import brotli  # 可选依赖，提供 br 压缩
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack  # 可选依赖，提供 application/msgpack 响应
+except ImportError:
+    msgpack = None
+
+# Flask 只在提供接口时才导入（见 create_app），python app.py update 不需要它
+Flask = jsonify = request = Response = None
+
+# 路由表: [(规则, 选项, 处理函数)]，create_app() 时注册到 Flask 应用
+_routes = []
+_app_lock = threading.Lock()
+
+def route(rule, **options):
+    """登记接口路由（装饰器）"""
+    def decorator(func):
+        _routes.append((rule, options, func))
+        return func
+    return decorator
+
+def create_app():
+    """导入 Flask，创建应用并注册所有路由"""
+    global Flask, jsonify, request, Response
+    from flask import Flask, jsonify, request, Response
+    flask_app = Flask(__name__)
+    flask_app.config['JSON_SORT_KEYS'] = False
+    for rule, options, func in _routes:
+        flask_app.add_url_rule(rule, view_func=func, **options)
+    return flask_app
+
+def __getattr__(name):
+    """首次访问模块属性 app 时才创建 Flask 应用"""
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _app_lock:
+        if "app" not in globals():
+            globals()["app"] = create_app()
+    return globals()["app"]
+
+# ==================== 运行指标 ====================
+
+# 指标定义: 名称 -> (类型, 说明)，/metrics 按 Prometheus 文本格式输出
+METRICS = {
+    "gacha_fetch_requests_total": ("counter", "维基页面请求次数"),
+    "gacha_fetch_bytes_total": ("counter", "维基页面下载字节数"),
+    "gacha_fetch_duration_seconds": ("histogram", "维基页面请求耗时"),
+    "gacha_fetch_retries_total": ("counter", "维基页面请求重试次数"),
+    "gacha_circuit_open_total": ("counter", "上游熔断打开次数"),
+    "gacha_circuit_state": ("gauge", "上游熔断状态（0 关闭，1 打开，2 半开）"),
+    "gacha_stage_duration_seconds": ("histogram", "刷新各阶段耗时（parse/extract/group/serialize）"),
+    "gacha_refresh_total": ("counter", "数据刷新次数"),
+    "gacha_refresh_duration_seconds": ("histogram", "单次数据刷新总耗时"),
+    "gacha_cache_lookups_total": ("counter", "缓存查询次数"),
+    "gacha_data_age_seconds": ("gauge", "缓存数据年龄"),
+}
+METRIC_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_metrics_lock = threading.Lock()
+# (名称, 排序后的标签元组) -> 计数值 / [各桶计数..., 总和, 次数]
+_counters = {}
+_histograms = {}
+
+def _metric_key(name, labels):
+    return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def inc_counter(name, value=1, **labels):
+    """计数器加 value"""
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name, value, **labels):
+    """向直方图记录一次观测值"""
+    key = _metric_key(name, labels)
+    with _metrics_lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [0] * (len(METRIC_BUCKETS) + 2)
+        index = bisect.bisect_left(METRIC_BUCKETS, value)
+        if index < len(METRIC_BUCKETS):
+            hist[index] += 1
+        hist[-2] += value
+        hist[-1] += 1
+
+def observe_stage(game, stage, start):
+    """记录从 start（perf_counter）到现在的阶段耗时"""
+    observe("gacha_stage_duration_seconds", time.perf_counter() - start, game=game, stage=stage)
+
+@contextlib.contextmanager
+def timed(stage, game):
+    """记录代码块耗时到 gacha_stage_duration_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(game, stage, start)
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_metrics(gauges=None):
+    """按 Prometheus 文本格式输出所有指标，gauges 为 {(名称, 标签元组): 值}"""
+    with _metrics_lock:
+        counters = dict(_counters)
+        histograms = {key: list(hist) for key, hist in _histograms.items()}
+    samples = {}
+    for (name, labels), value in list(counters.items()) + list((gauges or {}).items()):
+        samples.setdefault(name, []).append((labels, value))
+    for key, hist in histograms.items():
+        samples.setdefault(key[0], []).append((key[1], hist))
+    
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        if name not in samples:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for labels, value in sorted(samples[name]):
+            if metric_type != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(METRIC_BUCKETS, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {value[-1]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+def profile_refresh(game, output=None, limit=30):
+    """在 cProfile 下执行一次完整刷新（不使用增量和解析缓存），打印耗时最多的函数"""
+    import cProfile
+    import pstats
+    
+    profiler = cProfile.Profile()
+    _parse_memo.pop(game, None)
+    profiler.enable()
+    try:
+        result = GAME_FETCHERS[game]()
+    finally:
+        profiler.disable()
+    if output:
+        profiler.dump_stats(output)
+        print(f"性能分析结果已写入 {output}")
+    pstats.Stats(profiler).sort_stats("cumulative").print_stats(limit)
+    return result
+
+# ==================== 页面抓取 ====================
+
+_http_session = None
+_http_session_lock = threading.Lock()
+# 每个游戏最近一次解析结果: game -> (页面摘要, 解析结果)
+_parse_memo = {}
+
+def get_http_session():
+    """获取共享的 HTTP 会话（连接池复用，保持长连接）"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers["User-Agent"] = USER_AGENT
+                _http_session = session
+    return _http_session
+
+# 维基路径的第一段对应的游戏，用作指标标签
+WIKI_PATH_GAMES = {"ys": "genshin", "sr": "hsr", "zzz": "zzz"}
+
+def wiki_url(path):
+    """拼接维基页面地址"""
+    return WIKI_BASE_URL + path
+
+def page_game(url):
+    """根据页面地址判断所属游戏"""
+    return WIKI_PATH_GAMES.get(urlsplit(url).path.strip('/').split('/')[0], "unknown")
+
+def _page_cache_paths(url):
+    """页面缓存文件路径: (HTML文件, 元数据文件)"""
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    return os.path.join(PAGE_CACHE_DIR, key + ".html"), os.path.join(PAGE_CACHE_DIR, key + ".json")
+
+def _read_page_cache(url, with_content=True):
+    """读取磁盘上的页面缓存，不存在时返回 None；with_content 为 False 时只读元数据"""
+    if not PAGE_CACHE_DIR:
+        return None
+    html_path, meta_path = _page_cache_paths(url)
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if with_content:
+            with open(html_path, 'rb') as f:
+                meta["content"] = f.read()
+        elif not os.path.exists(html_path):
+            return None
+    except (OSError, ValueError):
+        return None
+    return meta
+
+def _atomic_write(path, data):
+    """先写临时文件再重命名，避免读到写了一半的文件"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _write_page_cache(url, page):
+    """保存页面内容和校验信息到磁盘"""
+    if not PAGE_CACHE_DIR:
+        return
+    try:
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+        html_path, meta_path = _page_cache_paths(url)
+        meta = {key: page[key] for key in ("url", "etag", "last_modified", "digest")}
+        _atomic_write(html_path, page["content"])
+        _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+    except OSError as e:
+        print(f"写入页面缓存出错: {e}")
+
+class CircuitOpenError(requests.RequestException):
+    """上游主机处于熔断状态，请求未发出"""
+
+# 每个主机的熔断状态: host -> {"failures": 连续失败次数, "opened_at": 熔断时间, "probing": 是否有试探请求在进行}
+_circuits = {}
+_circuit_lock = threading.Lock()
+
+def circuit_before_request(host):
+    """请求前检查熔断状态，熔断中直接抛出 CircuitOpenError
+    
+    熔断超过 CIRCUIT_RESET_TIMEOUT 后进入半开状态，只放行一个试探请求，
+    其结果决定恢复还是继续熔断。
+    """
+    with _circuit_lock:
+        circuit = _circuits.get(host)
+        if circuit is None or circuit["opened_at"] is None:
+            return
+        remaining = circuit["opened_at"] + CIRCUIT_RESET_TIMEOUT - time.time()
+        if remaining > 0 or circuit["probing"]:
+            raise CircuitOpenError(f"{host} 连续请求失败，已熔断，{max(int(remaining), 0)} 秒后重试")
+        circuit["probing"] = True
+
+def circuit_record(host, ok):
+    """记录一次请求结果：成功时恢复，连续失败达到阈值时熔断"""
+    with _circuit_lock:
+        circuit = _circuits.setdefault(host, {"failures": 0, "opened_at": None, "probing": False})
+        was_probing = circuit["probing"]
+        circuit["probing"] = False
+        if ok:
+            circuit["failures"] = 0
+            circuit["opened_at"] = None
+            return
+        circuit["failures"] += 1
+        if was_probing or circuit["failures"] >= CIRCUIT_FAILURE_THRESHOLD:
+            if circuit["opened_at"] is None or was_probing:
+                print(f"{host} 连续失败 {circuit['failures']} 次，熔断 {CIRCUIT_RESET_TIMEOUT} 秒")
+                inc_counter("gacha_circuit_open_total", host=host)
+            circuit["opened_at"] = time.time()
+
+def circuit_states():
+    """各主机的熔断状态: host -> closed / open / half_open"""
+    now = time.time()
+    states = {}
+    with _circuit_lock:
+        for host, circuit in _circuits.items():
+            if circuit["opened_at"] is None:
+                states[host] = "closed"
+            elif circuit["probing"] or now >= circuit["opened_at"] + CIRCUIT_RESET_TIMEOUT:
+                states[host] = "half_open"
+            else:
+                states[host] = "open"
+    return states
+
+def retry_delay(attempt):
+    """第 attempt 次重试前的等待时间：指数退避加全抖动，避免多个进程同时重试"""
+    return random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF * 2 ** attempt))
+
+def _read_body(response, deadline):
+    """读取响应正文，超过总时长上限时抛出 Timeout"""
+    chunks = []
+    for chunk in response.iter_content(chunk_size=16384):
+        chunks.append(chunk)
+        if time.monotonic() > deadline:
+            response.close()
+            raise requests.Timeout(f"下载超过 {FETCH_DEADLINE} 秒: {response.url}")
+    return b"".join(chunks)
+
+def _get_with_retry(url, headers, timeout, game, stream=False):
+    """发送请求，连接错误、超时和 5xx/429 时退避重试，返回 (响应, 正文)
+    
+    每次失败都计入所属主机的熔断器；熔断中抛出 CircuitOpenError，不再访问上游。
+    stream 为 True 时不读取正文（返回的正文为 None），由调用方逐块读取并关闭响应。
+    """
+    host = urlsplit(url).netloc
+    for attempt in range(FETCH_RETRIES + 1):
+        circuit_before_request(host)
+        start = time.perf_counter()
+        try:
+            response = get_http_session().get(url, headers=headers, timeout=(CONNECT_TIMEOUT, timeout), stream=True)
+            if stream and response.status_code not in RETRY_STATUSES:
+                content = None
+            else:
+                content = _read_body(response, time.monotonic() + FETCH_DEADLINE)
+        except requests.RequestException as e:
+            inc_counter("gacha_fetch_requests_total", game=game, status="error")
+            error = e
+        else:
+            inc_counter("gacha_fetch_requests_total", game=game, status=response.status_code)
+            if content is not None:
+                inc_counter("gacha_fetch_bytes_total", len(content), game=game)
+            if response.status_code not in RETRY_STATUSES:
+                circuit_record(host, True)
+                return response, content
+            error = requests.HTTPError(f"{response.status_code} Server Error for url: {url}", response=response)
+        finally:
+            observe("gacha_fetch_duration_seconds", time.perf_counter() - start, game=game)
+        
+        circuit_record(host, False)
+        if attempt == FETCH_RETRIES:
+            raise error
+        delay = retry_delay(attempt)
+        print(f"请求失败（{error}），{delay:.1f} 秒后第 {attempt + 1} 次重试: {url}")
+        inc_counter("gacha_fetch_retries_total", game=game)
+        time.sleep(delay)
+
+def fetch_page(url, timeout=REQUEST_TIMEOUT):
+    """获取维基页面，带条件请求、失败重试和磁盘缓存
+    
+    返回字典: url, content, digest, etag, last_modified, not_modified。
+    服务器返回 304 时直接使用磁盘缓存内容。上游熔断时抛出 CircuitOpenError
+    （requests.RequestException 的子类）。
+    """
+    cached = _read_page_cache(url)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    
+    response, content = _get_with_retry(url, headers, timeout, page_game(url))
+    
+    if response.status_code == 304 and cached:
+        print(f"页面未修改，使用缓存: {url}")
+        cached["not_modified"] = True
+        return cached
+    response.raise_for_status()
+    
+    page = {
+        "url": url,
+        "content": content,
+        "digest": hashlib.sha1(content).hexdigest(),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "not_modified": False,
+    }
+    _write_page_cache(url, page)
+    return page
+
+PAGE_STREAM_CHUNK = 65536  # 流式读取页面时每块的字节数
+
+def open_page_stream(url, timeout=REQUEST_TIMEOUT):
+    """以流的方式获取维基页面，返回逐块产出页面字节的迭代器
+    
+    请求（含重试和熔断检查）在调用时立即发出，失败时抛出 requests.RequestException；
+    正文边下载边写入磁盘缓存，内存中不保留整个页面。服务器返回 304 时从磁盘缓存逐块读取。
+    """
+    cached = _read_page_cache(url, with_content=False)
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    
+    game = page_game(url)
+    response, _ = _get_with_retry(url, headers, timeout, game, stream=True)
+    if response.status_code == 304 and cached:
+        response.close()
+        print(f"页面未修改，使用缓存: {url}")
+        stream = _iter_cached_page(open(_page_cache_paths(url)[0], 'rb'))
+    else:
+        try:
+            response.raise_for_status()
+        except requests.HTTPError:
+            response.close()
+            raise
+        stream = _iter_response_page(url, response, game)
+    # 先执行到第一个 yield，之后即使没有读取就调用 close() 也会释放连接或文件
+    next(stream)
+    return stream
+
+def _iter_cached_page(f):
+    with f:
+        yield b""
+        for chunk in iter(lambda: f.read(PAGE_STREAM_CHUNK), b""):
+            yield chunk
+
+def _iter_response_page(url, response, game):
+    """逐块产出响应正文，同时写入临时文件，读完后替换磁盘缓存
+    
+    与 _read_body 相同，从请求开始超过 FETCH_DEADLINE 仍未读完时抛出 Timeout。
+    """
+    deadline = time.monotonic() + FETCH_DEADLINE
+    digest = hashlib.sha1()
+    size = 0
+    tmp = None
+    if PAGE_CACHE_DIR:
+        try:
+            os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+            tmp_path = f"{_page_cache_paths(url)[0]}.{os.getpid()}.{threading.get_ident()}.tmp"
+            tmp = open(tmp_path, 'wb')
+        except OSError as e:
+            print(f"写入页面缓存出错: {e}")
+    completed = False
+    try:
+        yield b""
+        for chunk in response.iter_content(chunk_size=PAGE_STREAM_CHUNK):
+            digest.update(chunk)
+            size += len(chunk)
+            if tmp is not None:
+                tmp.write(chunk)
+            if time.monotonic() > deadline:
+                raise requests.Timeout(f"下载超过 {FETCH_DEADLINE} 秒: {url}")
+            yield chunk
+        completed = True
+    finally:
+        response.close()
+        inc_counter("gacha_fetch_bytes_total", size, game=game)
+        if tmp is not None:
+            tmp.close()
+            # 没有完整读完（出错或调用方提前停止）时丢弃临时文件
+            if not completed:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp.name)
+    if tmp is not None:
+        html_path, meta_path = _page_cache_paths(url)
+        meta = {"url": url, "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"), "digest": digest.hexdigest()}
+        try:
+            os.replace(tmp.name, html_path)
+            _atomic_write(meta_path, json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        except OSError as e:
+            print(f"写入页面缓存出错: {e}")
+
+def get_parse_memo(game, pages):
+    """页面内容与上次解析时相同时返回上次的解析结果"""
+    memo = _parse_memo.get(game)
+    key = tuple(page["digest"] for page in pages)
+    if memo is not None and memo[0] == key:
+        return memo[1]
+    return None
+
+def set_parse_memo(game, pages, result):
+    """记录本次解析结果"""
+    _parse_memo[game] = (tuple(page["digest"] for page in pages), result)
+
+# ==================== HTML解析 ====================
+
+# 只构建需要的子树：原神只需卡池表格，星铁和绝区零需要正文中的标题及其后的表格
+WIKITABLE_STRAINER = SoupStrainer('table', class_='wikitable')
+CONTENT_STRAINER = SoupStrainer('div', class_='mw-parser-output')
+
+def make_soup(content, parse_only=None, parser=None):
+    """构建 BeautifulSoup，优先使用 lxml，不可用或出错时回退到 html.parser"""
+    parser = parser or HTML_PARSER
+    if parser != 'html.parser' and HAS_LXML:
+        try:
+            return BeautifulSoup(content, 'lxml', parse_only=parse_only)
+        except Exception as e:
+            print(f"lxml 解析出错，回退到 html.parser: {e}")
+    return BeautifulSoup(content, 'html.parser', parse_only=parse_only)
+
+def make_content_soup(content, parser=None):
+    """只解析维基正文区域，页面结构不符时解析整个页面"""
+    soup = make_soup(content, CONTENT_STRAINER, parser)
+    if soup.find(['h3', 'h4']) is None:
+        soup = make_soup(content, parser=parser)
+    return soup
+
+# ==================== 表格行提取 ====================
+
+def compile_row_fields(fields):
+    """预编译表头规则: [(字段名, 正则)]，按顺序匹配表头文本，第一个命中的字段生效"""
+    return {"rules": [(field, re.compile(pattern)) for field, pattern in fields], "cache": {}}
+
+def header_field(spec, header):
+    """表头文本对应的字段名（无对应字段时为 None），结果按表头文本缓存"""
+    cache = spec["cache"]
+    if header not in cache:
+        cache[header] = next((field for field, pattern in spec["rules"] if pattern.search(header)), None)
+    return cache[header]
+
+def extract_table_rows(table, spec, first_wins=False, exact=None, next_td=False):
+    """单次遍历表格的所有行，按表头把单元格分派到字段
+    
+    返回 ({字段名: (表头文本, td)}, [各行表头文本])。同一字段出现多次时默认以最后一行为准，
+    first_wins 为 True 时以第一行为准，但 exact 中 {字段名: 表头文本} 完全相同的表头优先。
+    next_td 为 True 时表头所在行没有 td 则取其后的第一个 td（跨行表头）。
+    字段按首次出现的顺序排列。
+    """
+    fields = {}
+    exact_found = set()
+    headers = []
+    for row in table.find_all('tr'):
+        th = row.find('th')
+        if th is None:
+            continue
+        td = row.find('td')
+        if td is None and next_td:
+            td = th.find_next('td')
+        if td is None:
+            continue
+        header = th.get_text(strip=True)
+        headers.append(header)
+        field = header_field(spec, header)
+        if field is None or field in exact_found:
+            continue
+        if exact and exact.get(field) == header:
+            exact_found.add(field)
+            fields[field] = (header, td)
+        elif not (first_wins and field in fields):
+            fields[field] = (header, td)
+    return fields, headers
+
+def link_texts(td):
+    """单元格中所有非空链接文本"""
+    return [text for text in (a.get_text(strip=True) for a in td.find_all('a')) if text]
+
+# ==================== 增量更新 ====================
+
+def pool_identity(game, pool):
+    """卡池唯一标识：名称 + 开始时间（星铁卡池没有名称，使用五星内容）"""
+    if game == "genshin":
+        return (pool.get("name", ""), pool.get("start_time", ""))
+    if game == "hsr":
+        return (pool.get("five_star", ""), pool.get("start_time", ""))
+    return (pool.get("name", ""), pool.get("time", "").split("~")[0].strip())
+
+def known_pools(game, pools):
+    """上次结果中的卡池: {唯一标识: 卡池}"""
+    return {pool_identity(game, pool): pool for pool in pools}
+
+def is_incremental_stop(game, pool, version, newest_version, known):
+    """增量解析是否在此卡池处停止（页面按时间倒序排列）
+    
+    页面最新的版本区块总是完整重新解析，之后遇到与上次结果内容完全相同的已有卡池才停止，
+    使维基对当前卡池的修改（补充四星、修正时间、改名等）能被读到。更早版本中的修改
+    需要用 python app.py update --full 完整解析。
+    """
+    return version != newest_version and known.get(pool_identity(game, pool)) == pool
+
+def replace_parsed_prefix(game, new_pools, previous_pools, stop_pool):
+    """用重新解析的卡池替换上次结果中停止处之前的部分，stop_pool 为 None 表示整页已重新解析
+    
+    按位置而不是按标识替换，标识文本被修改的卡池不会与旧条目重复。
+    """
+    if stop_pool is None:
+        return list(new_pools)
+    stop_key = pool_identity(game, stop_pool)
+    index = next(i for i, pool in enumerate(previous_pools) if pool_identity(game, pool) == stop_key)
+    return list(new_pools) + previous_pools[index:]
+
+def load_previous_snapshot(game):
+    """读取上一次写入的快照用于增量更新，不存在或无效时返回 None"""
+    path = os.path.join(SNAPSHOT_DIR, SNAPSHOT_FILES[game])
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取上次快照失败，将完整解析: {e}")
+        return None
+    if is_error_result(previous):
+        return None
+    return previous
 
 # ==================== 原神卡池数据 ====================
 
+GENSHIN_ROW_FIELDS = compile_row_fields([
+    ("time", r'时间|期間'),
+    ("version", r'版本'),
+    ("five_stars", r'5星|五星'),
+    ("four_stars", r'4星|四星'),
+])
+GENSHIN_VERSION_PATTERN = re.compile(r'(\d+\.\d+|[月之]\S+)(上半|下半)?')
+TIME_RANGE_SEPARATORS = ('~', '至')
+YEAR_PATTERN = re.compile(r'\d{4}')
+
+# 表格中没有版本信息时，按卡池期数推断版本（按顺序匹配卡池名称）
+GENSHIN_POOL_NUMBER_VERSIONS = {
+    "089": "月之一", "088": "月之一",
+    "087": "5.8", "086": "5.8",
+    "085": "5.7", "084": "5.7",
+    "083": "5.6", "082": "5.6",
+    "081": "5.5", "080": "5.5",
+    "079": "5.4", "078": "5.4",
+    "077": "5.3", "076": "5.3",
+    "075": "5.2", "074": "5.2",
+}
+
+def is_chronicled_pool(entry):
+    """卡池是否来自集录祈愿页面"""
+    return entry.get("type") == "混池（集录）"
+
 def parse_genshin_gacha_table(table):
     """解析单个原神卡池表格"""
     try:
@@ -37,8 +707,6 @@ def parse_genshin_gacha_table(table):
         elif "集录" in name:
             pool_type = "混池（集录）"
         
-        # 查找所有行
-        rows = table.find_all('tr')
         data = {
             "name": name,
             "type": pool_type,
@@ -49,162 +717,302 @@ def parse_genshin_gacha_table(table):
             "five_stars": [],
             "four_stars": []
         }
+        fields, _ = extract_table_rows(table, GENSHIN_ROW_FIELDS)
         
-        # 处理所有行
-        for row in rows:
-            th = row.find('th')
-            if not th:
-                continue
-                
-            header_text = th.get_text(strip=True)
-            td = row.find('td')
-            if not td:
-                continue
-            
-            # 处理时间
-            if "时间" in header_text or "期間" in header_text:
-                date_str = td.get_text(strip=True)
-                if "~" in date_str:
-                    parts = date_str.split('~', 1)
-                    if len(parts) == 2:
-                        data["start_time"] = parts[0].strip()
-                        data["end_time"] = parts[1].strip()
-                elif "至" in date_str:
-                    parts = date_str.split('至', 1)
-                    if len(parts) == 2:
-                        data["start_time"] = parts[0].strip()
-                        data["end_time"] = parts[1].strip()
-            
-            # 处理版本
-            elif "版本" in header_text:
-                data["version"] = td.get_text(strip=True)
-                # 提取版本号
-                version_match = re.search(r'(\d+\.\d+|[月之]\S+)(上半|下半)?', data["version"])
-                if version_match:
-                    data["version_key"] = version_match.group(1)
-            
-            # 处理五星内容
-            elif "5星" in header_text or "五星" in header_text or "5星角色" in header_text or "5星武器" in header_text:
-                data["five_stars"] = [a.get_text(strip=True) for a in td.find_all('a') if a.get_text(strip=True)]
-            
-            # 处理四星内容
-            elif "4星" in header_text or "四星" in header_text or "4星角色" in header_text or "4星武器" in header_text:
-                data["four_stars"] = [a.get_text(strip=True) for a in td.find_all('a') if a.get_text(strip=True)]
+        # 处理时间
+        if "time" in fields:
+            date_str = fields["time"][1].get_text(strip=True)
+            for separator in TIME_RANGE_SEPARATORS:
+                if separator in date_str:
+                    start_time, end_time = date_str.split(separator, 1)
+                    data["start_time"] = start_time.strip()
+                    data["end_time"] = end_time.strip()
+                    break
+        
+        # 处理版本
+        if "version" in fields:
+            data["version"] = fields["version"][1].get_text(strip=True)
+            # 提取版本号
+            version_match = GENSHIN_VERSION_PATTERN.search(data["version"])
+            if version_match:
+                data["version_key"] = version_match.group(1)
+        
+        # 处理五星、四星内容
+        if "five_stars" in fields:
+            data["five_stars"] = link_texts(fields["five_stars"][1])
+        if "four_stars" in fields:
+            data["four_stars"] = link_texts(fields["four_stars"][1])
         
         return data
     except Exception as e:
         print(f"解析原神表格时出错: {e}")
         return None
 
-def fetch_genshin_gacha_data():
-    """获取原神祈愿数据"""
+# 往期祈愿页面中卡池表格的开始标签，按它切分页面交给进程池并行解析
+GENSHIN_HISTORY_TABLE_START = re.compile(rb'<table\b[^>]*\bclass=["\']?[^"\'>]*\bys-qy-table\b', re.IGNORECASE)
+GENSHIN_HISTORY_TABLE_STRAINER = SoupStrainer('table', class_='ys-qy-table')
+
+# 表格解析进程池，首次并行解析时创建，之后复用
+_parse_pool = None
+_parse_pool_workers = 0
+_parse_pool_lock = threading.Lock()
+
+def genshin_parse_workers(content):
+    """按页面大小和 CPU 核数决定往期祈愿页面的解析进程数，1 表示串行解析"""
+    if len(content) < PARSE_PARALLEL_MIN_BYTES:
+        return 1
+    return PARSE_WORKERS or os.cpu_count() or 1
+
+def get_parse_pool(workers):
+    """获取表格解析进程池
+    
+    子进程由 forkserver 启动（不支持时用 spawn），不直接从多线程的服务进程中 fork。
+    """
+    global _parse_pool, _parse_pool_workers
+    with _parse_pool_lock:
+        if _parse_pool is None or _parse_pool_workers != workers:
+            if _parse_pool is not None:
+                _parse_pool.shutdown(wait=False)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _parse_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _parse_pool_workers = workers
+        return _parse_pool
+
+def reset_parse_pool():
+    """丢弃出错的进程池，下次并行解析时重新创建"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False)
+        _parse_pool = None
+
+def _parse_genshin_history_chunk(content, parser=None):
+    """在子进程中解析往期祈愿页面的一段标记，按顺序返回其中卡池表格的解析结果"""
+    soup = make_soup(content, GENSHIN_HISTORY_TABLE_STRAINER, parser)
+    return [parse_genshin_gacha_table(table) for table in soup.find_all('table', class_='ys-qy-table')]
+
+def parse_genshin_history_parallel(content, workers, parser=None):
+    """在进程池中并行解析往期祈愿页面的卡池表格，按页面顺序返回解析结果
+    
+    父进程只用正则找出卡池表格的开始标签，从其中一部分处把页面切成段（卡池表格不嵌套，
+    不会被切开），不构建 soup；每个子进程只为自己的一段构建 soup。
+    与 find_genshin_tables 不同，这里不检查卡池表格是否位于 wikitable 内。
+    """
+    starts = [match.start() for match in GENSHIN_HISTORY_TABLE_START.finditer(content)]
+    if not starts:
+        return []
+    size = -(-len(starts) // (workers * 4))
+    bounds = starts[::size] + [len(content)]
+    chunks = [content[start:end] for start, end in zip(bounds, bounds[1:])]
+    results = get_parse_pool(workers).map(_parse_genshin_history_chunk, chunks, [parser] * len(chunks))
+    return [entry for entries in results for entry in entries]
+
+def fetch_genshin_gacha_data(previous=None):
+    """获取原神祈愿数据
+    
+    传入上次的结果 previous 时进行增量解析（见 is_incremental_stop），并与上次结果合并。
+    """
     try:
         print("开始从biligame获取原神祈愿数据...")
         
-        # 解析往期祈愿和集录祈愿页面
+        # 获取往期祈愿和集录祈愿页面
         print("获取往期祈愿页面...")
-        response1 = requests.get("https://wiki.biligame.com/ys/往期祈愿", timeout=30)
-        response1.raise_for_status()
-        soup1 = BeautifulSoup(response1.content, 'html.parser')
-        
+        page1 = fetch_page(wiki_url(GENSHIN_HISTORY_PATH))
         print("获取集录祈愿页面...")
-        response2 = requests.get("https://wiki.biligame.com/ys/集录祈愿", timeout=30)
-        response2.raise_for_status()
-        soup2 = BeautifulSoup(response2.content, 'html.parser')
-        
-        all_gacha_data = []
-        seen_names = set()
-        current_year = datetime.now().year
+        page2 = fetch_page(wiki_url(GENSHIN_CHRONICLED_PATH))
         
-        # 修改点：正确提取嵌套表格
-        tables = []
+        if previous is not None:
+            return parse_genshin_pages(page1["content"], page2["content"], previous=previous)
         
-        # 处理往期祈愿页面：查找所有包含卡池的内部表格
-        for outer_table in soup1.find_all('table', class_='wikitable'):
-            # 在内层查找所有卡池表格
-            inner_tables = outer_table.find_all('table', class_='ys-qy-table')
-            tables.extend(inner_tables)
+        memo = get_parse_memo("genshin", [page1, page2])
+        if memo is not None:
+            print("页面内容未变化，跳过解析")
+            return memo
         
+        result = parse_genshin_pages(page1["content"], page2["content"])
+        if "error" not in result:
+            set_parse_memo("genshin", [page1, page2], result)
+        return result
+    
+    except requests.RequestException as e:
+        print(f"网络请求出错: {e}")
+        return {"error": f"网络请求失败: {str(e)}"}
+
+def find_genshin_history_tables(soup):
+    """找出往期祈愿页面中的卡池表格"""
+    # 修改点：正确提取嵌套表格
+    history_tables = []
+    
+    # 处理往期祈愿页面：查找所有包含卡池的内部表格
+    for outer_table in soup.find_all('table', class_='wikitable'):
+        # 在内层查找所有卡池表格
+        inner_tables = outer_table.find_all('table', class_='ys-qy-table')
+        history_tables.extend(inner_tables)
+    return history_tables
+
+def find_genshin_tables(soup1, soup2):
+    """找出往期祈愿和集录祈愿页面中的卡池表格，返回 (往期表格, 集录表格)"""
+    # 处理集录祈愿页面：直接获取所有表格
+    return find_genshin_history_tables(soup1), soup2.find_all('table', class_='wikitable')
+
+def fix_genshin_year(entry, current_year):
+    """添加年份到日期（如果日期中还没有年份）"""
+    if entry["start_time"] and not YEAR_PATTERN.search(entry["start_time"]):
+        entry["start_time"] = f"{current_year}/" + entry["start_time"].replace('/', '-')
+    if entry["end_time"] and not YEAR_PATTERN.search(entry["end_time"]):
+        entry["end_time"] = f"{current_year}/" + entry["end_time"].replace('/', '-')
+
+def iter_genshin_entries(tables, current_year=None):
+    """逐个解析卡池表格，产出去重并补全年份后的原神卡池"""
+    if current_year is None:
+        current_year = datetime.now().year
+    
+    seen_names = set()
+    for table in tables:
+        entry = parse_genshin_gacha_table(table)
+        if not entry or not entry.get("name") or entry["name"] == "未知卡池" or entry["name"] in seen_names:
+            continue
+        seen_names.add(entry["name"])
+        fix_genshin_year(entry, current_year)
+        yield entry
+
+def iter_genshin_page_tables(content, chronicled, parser=None, stream=False):
+    """逐个产出一个页面中的卡池表格
+    
+    页面的 soup 只在迭代期间存在，两个页面依次迭代时不会同时保留两棵树。stream 为 True 时
+    用 BlockExtractor 逐个截取表格（见 iter_streamed_genshin），内存中只有当前表格的 soup，
+    但比一次性构建 soup 慢约四成。
+    """
+    if stream:
+        select = select_wikitable if chronicled else select_genshin_history_table
+        for _, table in iter_page_blocks([content], select, parser):
+            yield table
+            if chronicled:
+                yield from table.find_all('table', class_='wikitable')
+        return
+    with timed("parse", "genshin"):
+        soup = make_soup(content, WIKITABLE_STRAINER, parser)
+    if chronicled:
         # 处理集录祈愿页面：直接获取所有表格
-        tables.extend(soup2.find_all('table', class_='wikitable'))
+        yield from soup.find_all('table', class_='wikitable')
+    else:
+        yield from find_genshin_history_tables(soup)
+
+def iter_genshin_history(content1, content2, current_year=None, parser=None):
+    """按页面顺序逐个产出全部原神卡池，不分组也不限制版本数"""
+    tables = itertools.chain(iter_genshin_page_tables(content1, False, parser),
+                             iter_genshin_page_tables(content2, True, parser))
+    yield from iter_genshin_entries(tables, current_year)
+
+def parse_genshin_pages(content1, content2, current_year=None, parser=None, previous=None):
+    """解析往期祈愿和集录祈愿页面内容
+    
+    增量模式下每个页面按 is_incremental_stop 停止，重新解析的部分替换上次结果中对应的部分。
+    两个页面依次解析，解析完一个页面才构建下一个页面的 soup。完整解析且往期祈愿页面足够大时，
+    其中的表格在进程池中并行解析（见 genshin_parse_workers）；不限制版本数（MAX_VERSIONS 为 None）
+    时结果包含全部历史，页面改为流式截取（见 iter_genshin_page_tables），不构建整页的 soup。
+    """
+    try:
+        workers = genshin_parse_workers(content1) if previous is None else 1
+        stream = MAX_VERSIONS is None
+        history_entries = history_tables = None
+        if workers > 1:
+            try:
+                with timed("parse", "genshin"):
+                    history_entries = parse_genshin_history_parallel(content1, workers, parser)
+            except (OSError, BrokenProcessPool) as e:
+                print(f"并行解析出错，改为串行解析: {e}")
+                reset_parse_pool()
+        if history_entries is None:
+            history_tables = iter_genshin_page_tables(content1, False, parser, stream)
+            history_entries = map(parse_genshin_gacha_table, history_tables)
+        chronicled_tables = iter_genshin_page_tables(content2, True, parser, stream)
+        chronicled_entries = map(parse_genshin_gacha_table, chronicled_tables)
         
-        print(f"发现有效卡池表格: {len(tables)} 个")
+        all_gacha_data = []
+        seen_names = set()
+        if current_year is None:
+            current_year = datetime.now().year
         
-        # 解析所有卡池表格
+        known = None
+        stop_pools = []
+        if previous is not None:
+            known = known_pools("genshin", previous.get("gacha_data", []))
+        
+        # 逐页解析所有卡池表格（页面的 soup 在迭代时构建，计入 parse 阶段）
+        extract_start = time.perf_counter()
         successful_parses = 0
-        for i, table in enumerate(tables, 1):
-            try:
-                print(f"解析表格 {i}/{len(tables)}...")
-                entry = parse_genshin_gacha_table(table)
-                if not entry or not entry.get("name") or entry["name"] == "未知卡池":
-                    print(f"表格 {i} 未找到有效名称，跳过")
-                    continue
+        i = 0
+        for page_entries, page_tables in ((history_entries, history_tables), (chronicled_entries, chronicled_tables)):
+            newest_version = None
+            stop_pool = None
+            for entry in page_entries:
+                i += 1
+                try:
+                    print(f"解析表格 {i}...")
+                    if not entry or not entry.get("name") or entry["name"] == "未知卡池":
+                        print(f"表格 {i} 未找到有效名称，跳过")
+                        continue
+                        
+                    if entry["name"] in seen_names:
+                        print(f"跳过重复卡池: {entry['name']}")
+                        continue
+                        
+                    fix_genshin_year(entry, current_year)
                     
-                if entry["name"] in seen_names:
-                    print(f"跳过重复卡池: {entry['name']}")
-                    continue
+                    if newest_version is None:
+                        newest_version = entry["version_key"]
+                    if known is not None and is_incremental_stop("genshin", entry, entry["version_key"],
+                                                                 newest_version, known):
+                        print(f"到达未变化的已有卡池 {entry['name']}，停止解析本页剩余表格")
+                        stop_pool = entry
+                        break
                     
-                # 添加年份到日期（如果日期中还没有年份）
-                if entry["start_time"] and not re.search(r'\d{4}', entry["start_time"]):
-                    entry["start_time"] = f"{current_year}/" + entry["start_time"].replace('/', '-')
-                if entry["end_time"] and not re.search(r'\d{4}', entry["end_time"]):
-                    entry["end_time"] = f"{current_year}/" + entry["end_time"].replace('/', '-')
-                
-                print(f"添加卡池: {entry['name']} ({entry['type']}) - 五星: {len(entry['five_stars'])}个, 四星: {len(entry['four_stars'])}个")
-                all_gacha_data.append(entry)
-                seen_names.add(entry["name"])
-                successful_parses += 1
-                
-            except Exception as e:
-                print(f"解析表格 {i} 出错: {e}")
-                continue
+                    print(f"添加卡池: {entry['name']} ({entry['type']}) - 五星: {len(entry['five_stars'])}个, 四星: {len(entry['four_stars'])}个")
+                    all_gacha_data.append(entry)
+                    seen_names.add(entry["name"])
+                    successful_parses += 1
+                    
+                except Exception as e:
+                    print(f"解析表格 {i} 出错: {e}")
+                    continue
+            stop_pools.append(stop_pool)
+            if page_tables is not None:
+                # 增量模式提前停止时立即释放本页的 soup，再构建下一个页面的
+                page_tables.close()
 
+        observe_stage("genshin", "extract", extract_start)
         print(f"成功解析卡池数: {successful_parses}")
         
-        if successful_parses == 0:
+        total_pools = successful_parses
+        if previous is not None:
+            # 两个页面分别用本次解析的部分替换上次结果中停止处之前的部分
+            previous_entries = previous.get("gacha_data", [])
+            merged = []
+            for chronicled, stop_pool in zip((False, True), stop_pools):
+                merged.extend(replace_parsed_prefix(
+                    "genshin",
+                    [entry for entry in all_gacha_data if is_chronicled_pool(entry) == chronicled],
+                    [entry for entry in previous_entries if is_chronicled_pool(entry) == chronicled],
+                    stop_pool))
+            added = len(merged) - len(previous_entries)
+            total_pools = previous.get("total_pools", len(previous_entries)) + added
+            all_gacha_data = merged
+            print(f"增量模式: 重新解析卡池 {successful_parses} 个，新增 {added} 个")
+        
+        if not all_gacha_data:
             return {"error": "未能成功解析任何卡池数据"}
         
         # 按版本分组
+        group_start = time.perf_counter()
         version_data = {}
         for entry in all_gacha_data:
             key = entry.get("version_key", "其他")
             if not key or key == "其他":
                 # 尝试从名称中提取版本信息
                 name = entry["name"]
-                if "089" in name:
-                    key = "月之一"
-                elif "088" in name:
-                    key = "月之一"
-                elif "087" in name:
-                    key = "5.8"
-                elif "086" in name:
-                    key = "5.8"
-                elif "085" in name:
-                    key = "5.7"
-                elif "084" in name:
-                    key = "5.7"
-                elif "083" in name:
-                    key = "5.6"
-                elif "082" in name:
-                    key = "5.6"
-                elif "081" in name:
-                    key = "5.5"
-                elif "080" in name:
-                    key = "5.5"
-                elif "079" in name:
-                    key = "5.4"
-                elif "078" in name:
-                    key = "5.4"
-                elif "077" in name:
-                    key = "5.3"
-                elif "076" in name:
-                    key = "5.3"
-                elif "075" in name:
-                    key = "5.2"
-                elif "074" in name:
-                    key = "5.2"
-                else:
-                    key = "其他"
+                key = next((version for number, version in GENSHIN_POOL_NUMBER_VERSIONS.items() if number in name), "其他")
             
             version_data.setdefault(key, []).append(entry)
         
@@ -231,7 +1039,7 @@ def fetch_genshin_gacha_data():
             reverse=True
         )
         
-        # 只取最新的版本
+        # 只取最新的版本（MAX_VERSIONS 为 None 时保留全部）
         latest_versions = sorted_versions[:MAX_VERSIONS]
         print(f"所有版本: {sorted_versions}")
         print(f"最新版本: {latest_versions}")
@@ -239,7 +1047,7 @@ def fetch_genshin_gacha_data():
         # 构建最终数据结构
         result = {
             "last_updated": datetime.now().isoformat(),
-            "total_pools": successful_parses,
+            "total_pools": total_pools,
             "latest_versions": latest_versions,
             "gacha_data": []
         }
@@ -247,13 +1055,11 @@ def fetch_genshin_gacha_data():
         # 只包含最新版本的数据
         for version in latest_versions:
             result["gacha_data"].extend(version_data[version])
+        observe_stage("genshin", "group", group_start)
         
         print(f"最终返回卡池数: {len(result['gacha_data'])}")
         return result
     
-    except requests.RequestException as e:
-        print(f"网络请求出错: {e}")
-        return {"error": f"网络请求失败: {str(e)}"}
     except Exception as e:
         print(f"获取祈愿数据出错: {e}")
         import traceback
@@ -302,114 +1108,142 @@ def parse_star_rail_time_range(time_str):
 
 def scrape_hsr_wish_data():
     """从biligame维基爬取崩坏：星穹铁道卡池信息"""
-    url = "https://wiki.biligame.com/sr/%E5%8E%86%E5%8F%B2%E8%B7%83%E8%BF%81"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
-    
     try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        page = fetch_page(wiki_url(HSR_HISTORY_PATH))
+        memo = get_parse_memo("hsr", [page])
+        if memo is not None:
+            print("页面内容未变化，跳过解析")
+            return memo
         
-        # 定位包含版本信息的容器
-        wish_data = []
-        version_containers = []
+        wish_data = parse_hsr_page(page["content"])
+        if wish_data:
+            set_parse_memo("hsr", [page], wish_data)
+        return wish_data
+    
+    except Exception as e:
+        print(f"爬取星穹铁道卡池数据时出错: {str(e)}")
+        return []
+
+HSR_ROW_FIELDS = compile_row_fields([
+    ("time", r'时间'),
+    ("version", r'版本'),
+    ("star5", r'5星(角色|光锥)'),
+    ("star4", r'4星(角色|光锥)'),
+])
+HSR_EXACT_HEADERS = {"time": "时间", "version": "版本"}
+HSR_VERSION_PATTERN = re.compile(r'(\d+\.\d+)')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+def extract_hsr_wish_info(table):
+    """从单个星穹铁道卡池表格中提取原始字段
+    
+    与逐字段查找表头再取 find_next('td') 的写法一致：同一字段以第一行为准，
+    表头恰好为“时间”“版本”的行优先，表头所在行没有 td 时取其后的第一个 td。
+    """
+    wish_info = {}
+    fields, _ = extract_table_rows(table, HSR_ROW_FIELDS, first_wins=True,
+                                   exact=HSR_EXACT_HEADERS, next_td=True)
+    
+    # 提取时间
+    if "time" in fields:
+        wish_info['时间'] = fields["time"][1].get_text(strip=False).replace('\t', '')
+    
+    # 提取版本
+    if "version" in fields:
+        version_text = fields["version"][1].get_text(strip=True)
+        version_match = HSR_VERSION_PATTERN.search(version_text)
+        wish_info['版本'] = version_match.group(1) if version_match else version_text
+    
+    # 提取5星角色/光锥 - 保留完整文本
+    if "star5" in fields:
+        header, star5_td = fields["star5"]
+        wish_info['5星类型'] = "角色" if "角色" in header else "光锥"
+        wish_info['5星内容'] = WHITESPACE_PATTERN.sub(' ', star5_td.get_text(strip=True))
+    
+    # 提取4星角色/光锥
+    if "star4" in fields:
+        header, star4_td = fields["star4"]
+        star4_items = []
+        for item in star4_td.children:
+            if item.name == 'br':
+                continue
+            if item.name == 'a':
+                item_text = item.get_text(strip=True)
+                if item_text:
+                    star4_items.append(item_text)
+            elif isinstance(item, str) and item.strip():
+                star4_items.append(item.strip())
         
-        # 查找所有版本标题（h4标签）
-        version_headers = soup.find_all(['h3', 'h4'], class_=lambda x: x != 'mw-editsection')
+        if not star4_items:
+            star4_text = star4_td.get_text(strip=True)
+            star4_items = [s.strip() for s in star4_text.split('\n') if s.strip()]
         
-        # 收集最近版本的容器
-        for header in version_headers:
-            if header.find('span', class_='mw-headline'):
-                version_containers.append(header)
-                if len(version_containers) >= MAX_VERSIONS:  # 只取最近版本
-                    break
+        wish_info['4星类型'] = "角色" if "角色" in header else "光锥"
+        wish_info['4星内容'] = ", ".join(star4_items)
+    
+    # 确定卡池类型
+    if '5星类型' in wish_info:
+        wish_info['卡池类型'] = "角色池" if wish_info['5星类型'] == "角色" else "光锥池"
+    return wish_info
+
+def iter_hsr_wishes(soup, max_versions=None):
+    """按页面顺序逐个产出星穹铁道卡池，max_versions 为 None 时不限制版本数"""
+    # 查找所有版本标题（h4标签）
+    version_headers = soup.find_all(['h3', 'h4'], class_=lambda x: x != 'mw-editsection')
+    
+    version_count = 0
+    for header in version_headers:
+        if not header.find('span', class_='mw-headline'):
+            continue
+        if max_versions is not None and version_count >= max_versions:  # 只取最近版本
+            break
+        version_count += 1
         
-        # 遍历每个版本容器
-        for container in version_containers:
-            # 找到当前容器下所有卡池表格
-            wish_tables = []
-            next_sibling = container.next_sibling
-            
-            # 收集直到下一个标题的所有表格
-            while next_sibling and next_sibling.name not in ['h3', 'h4']:
-                if next_sibling.name == 'div' and 'row' in next_sibling.get('class', []):
-                    wish_tables.extend(next_sibling.find_all('table', class_='wikitable'))
-                next_sibling = next_sibling.next_sibling
-            
-            # 处理每个卡池表格
-            for table in wish_tables:
-                wish_info = {}
-                
-                # 提取时间
-                time_th = table.find('th', string='时间')
-                if not time_th:
-                    time_th = table.find('th', string=re.compile(r'时间'))
-                if time_th:
-                    time_td = time_th.find_next('td')
-                    if time_td:
-                        wish_info['时间'] = time_td.get_text(strip=False).replace('\t', '')
-                
-                # 提取版本
-                version_th = table.find('th', string='版本')
-                if not version_th:
-                    version_th = table.find('th', string=re.compile(r'版本'))
-                if version_th:
-                    version_td = version_th.find_next('td')
-                    if version_td:
-                        version_text = version_td.get_text(strip=True)
-                        version_match = re.search(r'(\d+\.\d+)', version_text)
-                        if version_match:
-                            wish_info['版本'] = version_match.group(1)
-                        else:
-                            wish_info['版本'] = version_text
-                
-                # 提取5星角色/光锥 - 保留完整文本
-                star5_row = table.find('th', string=re.compile(r'5星(角色|光锥)'))
-                if star5_row:
-                    star5_type = "角色" if "角色" in star5_row.get_text() else "光锥"
-                    star5_td = star5_row.find_next('td')
-                    if star5_td:
-                        star5_text = star5_td.get_text(strip=True)
-                        star5_text = re.sub(r'\s+', ' ', star5_text)
-                        wish_info['5星类型'] = star5_type
-                        wish_info['5星内容'] = star5_text
-                
-                # 提取4星角色/光锥
-                star4_row = table.find('th', string=re.compile(r'4星(角色|光锥)'))
-                if star4_row:
-                    star4_type = "角色" if "角色" in star4_row.get_text() else "光锥"
-                    star4_td = star4_row.find_next('td')
-                    if star4_td:
-                        star4_items = []
-                        for item in star4_td.children:
-                            if item.name == 'br':
-                                continue
-                            if item.name == 'a':
-                                item_text = item.get_text(strip=True)
-                                if item_text:
-                                    star4_items.append(item_text)
-                            elif isinstance(item, str) and item.strip():
-                                star4_items.append(item.strip())
-                        
-                        if not star4_items:
-                            star4_text = star4_td.get_text(strip=True)
-                            star4_items = [s.strip() for s in star4_text.split('\n') if s.strip()]
-                        
-                        wish_info['4星类型'] = star4_type
-                        wish_info['4星内容'] = ", ".join(star4_items)
-                
-                # 确定卡池类型
-                if '5星类型' in wish_info:
-                    wish_info['卡池类型'] = "角色池" if wish_info['5星类型'] == "角色" else "光锥池"
-                    wish_data.append(wish_info)
+        # 收集直到下一个标题的所有表格
+        next_sibling = header.next_sibling
+        while next_sibling and next_sibling.name not in ['h3', 'h4']:
+            if next_sibling.name == 'div' and 'row' in next_sibling.get('class', []):
+                yield from hsr_row_wishes(next_sibling)
+            next_sibling = next_sibling.next_sibling
+
+def hsr_row_wishes(row):
+    """产出一个 div.row 区块中的卡池"""
+    for table in row.find_all('table', class_='wikitable'):
+        wish_info = extract_hsr_wish_info(table)
+        if '卡池类型' in wish_info:
+            yield wish_info
+
+def parse_hsr_page(content, parser=None, known=None):
+    """解析星穹铁道历史跃迁页面内容
+    
+    传入上次结果的 known_pools 时进行增量解析，按 is_incremental_stop 停止，
+    返回 (重新解析的卡池, 停止处的已有卡池或 None)。
+    """
+    wish_data = []
+    stop_pool = None
+    try:
+        with timed("parse", "hsr"):
+            soup = make_content_soup(content, parser)
+        extract_start = time.perf_counter()
         
-        return wish_data
+        newest_version = None
+        for wish_info in iter_hsr_wishes(soup, MAX_VERSIONS):
+            if known is not None:
+                wish = format_hsr_wish_data([wish_info])[0]
+                if newest_version is None:
+                    newest_version = wish["version"]
+                if is_incremental_stop("hsr", wish, wish["version"], newest_version, known):
+                    print(f"到达未变化的已有卡池 {wish['five_star']}，停止解析")
+                    stop_pool = wish
+                    break
+            wish_data.append(wish_info)
+        
+        observe_stage("hsr", "extract", extract_start)
     
     except Exception as e:
         print(f"爬取星穹铁道卡池数据时出错: {str(e)}")
-        return []
+        wish_data = []
+    return wish_data if known is None else (wish_data, stop_pool)
 
 def format_hsr_wish_data(wish_data):
     """格式化星穹铁道卡池数据用于API输出"""
@@ -437,12 +1271,46 @@ def format_hsr_wish_data(wish_data):
     
     return formatted_data
 
-def fetch_hsr_wish_data():
+def merge_hsr_wish_data(new_data, previous_data, stop_pool):
+    """合并增量解析结果与上次结果，只保留最近 MAX_VERSIONS 个版本"""
+    merged = replace_parsed_prefix("hsr", new_data, previous_data, stop_pool)
+    
+    versions = []
+    for wish in merged:
+        if wish["version"] not in versions:
+            versions.append(wish["version"])
+    latest_versions = set(versions[:MAX_VERSIONS])
+    return [wish for wish in merged if wish["version"] in latest_versions]
+
+def fetch_hsr_wish_data(previous=None):
+    """获取星穹铁道卡池数据
+    
+    传入上次的结果 previous 时进行增量解析（见 is_incremental_stop），并与上次结果合并。
+    """
+    if previous is not None and previous.get("wish_data"):
+        try:
+            page = fetch_page(wiki_url(HSR_HISTORY_PATH))
+        except requests.RequestException as e:
+            print(f"爬取星穹铁道卡池数据时出错: {str(e)}")
+            return {"error": "Failed to fetch wish data"}
+        raw_data, stop_pool = parse_hsr_page(page["content"], known=known_pools("hsr", previous["wish_data"]))
+        if not raw_data and stop_pool is None:
+            return {"error": "No valid wish data found"}
+        with timed("group", "hsr"):
+            new_data = format_hsr_wish_data(raw_data)
+            wish_data = merge_hsr_wish_data(new_data, previous["wish_data"], stop_pool)
+        print(f"增量模式: 重新解析卡池 {len(new_data)} 个")
+        return {
+            "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "wish_data": wish_data
+        }
+    
     raw_data = scrape_hsr_wish_data()
     if not raw_data:
         return {"error": "Failed to fetch wish data"}
         
-    formatted_data = format_hsr_wish_data(raw_data)
+    with timed("group", "hsr"):
+        formatted_data = format_hsr_wish_data(raw_data)
     
     if not formatted_data:
         return {"error": "No valid wish data found"}
@@ -457,6 +1325,14 @@ def fetch_hsr_wish_data():
 
 # ==================== 绝区零卡池数据 ====================
 
+ZZZ_ROW_FIELDS = compile_row_fields([
+    ("up_s", r'^(?:S级代理人|S级音擎)$'),
+    ("up_a", r'^(?:A级代理人|A级音擎)$'),
+    ("time", r'^时间$'),
+    ("version", r'^版本$'),
+])
+ZZZ_BRACKET_PATTERN = re.compile(r'\[([^\]]+)\]')
+
 def extract_zzz_agent_data(td):
     """提取绝区零代理人数据"""
     # 尝试提取链接
@@ -470,7 +1346,7 @@ def extract_zzz_agent_data(td):
     if not agents:
         text_content = td.get_text(strip=True)
         # 使用正则表达式提取方括号内的内容
-        matches = re.findall(r'\[([^\]]+)\]', text_content)
+        matches = ZZZ_BRACKET_PATTERN.findall(text_content)
         if matches:
             agents = matches
         elif text_content:
@@ -510,28 +1386,14 @@ def extract_zzz_pool_data(table, pool_type):
     if not data.get('name') and title_th:
         data['name'] = title_th.get_text(strip=True)
     
-    # 提取所有行
-    rows = table.find_all('tr')
-    agent_headers = []  # 记录表头信息用于类型判断
-    
-    for row in rows:
-        th = row.find('th')
-        td = row.find('td')
-        if not th or not td:
-            continue
-            
-        header = th.get_text(strip=True)
-        agent_headers.append(header)  # 收集表头信息
-        
+    # 单次遍历所有行，agent_headers 记录表头信息用于类型判断
+    fields, agent_headers = extract_table_rows(table, ZZZ_ROW_FIELDS)
+    for field, (_, td) in fields.items():
         # 统一处理S级/A级数据
-        if header in ['S级代理人', 'S级音擎']:
-            data['up_s'] = extract_zzz_agent_data(td)
-        elif header in ['A级代理人', 'A级音擎']:
-            data['up_a'] = extract_zzz_agent_data(td)
-        elif header == '时间':
-            data['time'] = td.get_text(strip=True)
-        elif header == '版本':
-            data['version'] = td.get_text(strip=True)
+        if field in ('up_s', 'up_a'):
+            data[field] = extract_zzz_agent_data(td)
+        else:
+            data[field] = td.get_text(strip=True)
     
     # 优化卡池类型判断逻辑
     # 方法1: 检查表头特征词
@@ -551,41 +1413,69 @@ def extract_zzz_pool_data(table, pool_type):
     
     return data
 
-def get_zzz_gacha_data():
-    """获取绝区零卡池数据"""
-    url = "https://wiki.biligame.com/zzz/%E5%BE%80%E6%9C%9F%E8%B0%83%E9%A2%91"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-    }
+def get_zzz_gacha_data(previous=None):
+    """获取绝区零卡池数据
     
+    传入上次的结果 previous 时进行增量解析（见 is_incremental_stop），并与上次结果合并。
+    """
     try:
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+        page = fetch_page(wiki_url(ZZZ_HISTORY_PATH), timeout=15)
     except requests.exceptions.RequestException as e:
         return {"error": f"请求失败: {str(e)}"}
     
-    soup = BeautifulSoup(response.content, 'html.parser')
-    all_versions = []
+    if previous is not None:
+        known = known_pools("zzz", [pool for block in previous for pool in block["pools"]])
+        new_versions, stop_pool = parse_zzz_page(page["content"], known=known)
+        if not new_versions and stop_pool is None:
+            return {"error": "未能解析任何卡池数据"}
+        print(f"增量模式: 重新解析卡池 {sum(len(block['pools']) for block in new_versions)} 个")
+        return merge_zzz_versions(new_versions, previous, stop_pool)
+    
+    memo = get_parse_memo("zzz", [page])
+    if memo is not None:
+        print("页面内容未变化，跳过解析")
+        return memo
     
+    latest_versions = parse_zzz_page(page["content"])
+    set_parse_memo("zzz", [page], latest_versions)
+    return latest_versions
+
+def zzz_version_sort_key(block):
+    """绝区零版本排序键"""
+    return [int(part) for part in block['version'].split('.')]
+
+def merge_zzz_versions(new_versions, previous, stop_pool):
+    """合并增量解析结果与上次结果：上次结果中停止处之前的卡池由本次解析结果替换，
+    同一版本的新卡池排在前面"""
+    merged = [dict(block, pools=list(block["pools"])) for block in new_versions]
+    blocks_by_version = {(block["version"], block["phase"]): block for block in merged}
+    stop_key = pool_identity("zzz", stop_pool) if stop_pool is not None else None
+    keeping = False
+    
+    for block in previous:
+        pools = []
+        for pool in block["pools"]:
+            keeping = keeping or (stop_key is not None and pool_identity("zzz", pool) == stop_key)
+            if keeping:
+                pools.append(pool)
+        target = blocks_by_version.get((block["version"], block["phase"]))
+        if target is not None:
+            target["pools"].extend(pools)
+        elif pools:
+            merged.append(dict(block, pools=pools))
+    
+    merged.sort(key=zzz_version_sort_key, reverse=True)
+    return merged[:MAX_VERSIONS]
+
+def iter_zzz_pools(soup):
+    """按页面顺序逐个产出绝区零卡池: (版本标题序号, 版本号, 上下半, 卡池)"""
     # 找到所有版本标题 (h3标签)
     version_headings = soup.find_all('h3')
-    for heading in version_headings:
-        version_span = heading.find('span', class_='mw-headline')
-        if not version_span:
-            continue
-            
-        version_title = version_span.get_text(strip=True)
-        if '·' in version_title:
-            version_number = version_title.split('·')[0].strip()
-            # 判断是上半还是下半
-            if "第一" in version_title or "上半" in version_title:
-                phase = "上半"
-            elif "第二" in version_title or "下半" in version_title:
-                phase = "下半"
-            else:
-                phase = "未知"
-        else:
+    for heading_index, heading in enumerate(version_headings):
+        heading_version = zzz_heading_version(heading)
+        if heading_version is None:
             continue
+        version_number, phase = heading_version
         
         # 获取当前版本区块的所有外层表格
         version_tables = []
@@ -596,86 +1486,2252 @@ def get_zzz_gacha_data():
                 version_tables.append(next_element)
             next_element = next_element.find_next_sibling()
         
-        pools = []
         for outer_table in version_tables:
-            # 查找所有内嵌的卡池表格
-            inner_tables = outer_table.find_all('table', class_='wikitable')
-            for inner_table in inner_tables:
-                # 检查是否是卡池表格（包含ys-qy-title类）
-                if inner_table.find('th', class_='ys-qy-title'):
-                    # 初始类型判断（后续会优化）
-                    pool_type = "character" if "独家频段" in inner_table.get_text() else "weapon" if "音擎频段" in inner_table.get_text() else "unknown"
-                    pools.append(extract_zzz_pool_data(inner_table, pool_type))
-        
-        if pools:
+            for pool in zzz_table_pools(outer_table):
+                yield heading_index, version_number, phase, pool
+
+def zzz_heading_version(heading):
+    """从版本标题解析 (版本号, 上下半)，不是版本标题时返回 None"""
+    version_span = heading.find('span', class_='mw-headline')
+    if not version_span:
+        return None
+    
+    version_title = version_span.get_text(strip=True)
+    if '·' not in version_title:
+        return None
+    version_number = version_title.split('·')[0].strip()
+    # 判断是上半还是下半
+    if "第一" in version_title or "上半" in version_title:
+        phase = "上半"
+    elif "第二" in version_title or "下半" in version_title:
+        phase = "下半"
+    else:
+        phase = "未知"
+    return version_number, phase
+
+def zzz_table_pools(outer_table):
+    """产出一个外层表格中内嵌的所有卡池"""
+    # 查找所有内嵌的卡池表格
+    for inner_table in outer_table.find_all('table', class_='wikitable'):
+        # 检查是否是卡池表格（包含ys-qy-title类）
+        if inner_table.find('th', class_='ys-qy-title'):
+            # 初始类型判断（后续会优化）
+            table_text = inner_table.get_text()
+            pool_type = "character" if "独家频段" in table_text else "weapon" if "音擎频段" in table_text else "unknown"
+            yield extract_zzz_pool_data(inner_table, pool_type)
+
+def parse_zzz_page(content, parser=None, known=None):
+    """解析绝区零往期调频页面内容
+    
+    传入上次结果的 known_pools 时进行增量解析，按 is_incremental_stop 停止，
+    返回 (重新解析的版本区块, 停止处的已有卡池或 None)。
+    """
+    with timed("parse", "zzz"):
+        soup = make_content_soup(content, parser)
+    extract_start = time.perf_counter()
+    all_versions = []
+    current_heading = None
+    newest_heading = None
+    stop_pool = None
+    
+    for heading_index, version_number, phase, pool in iter_zzz_pools(soup):
+        if newest_heading is None:
+            newest_heading = heading_index
+        if known is not None and is_incremental_stop("zzz", pool, heading_index, newest_heading, known):
+            print(f"到达未变化的已有卡池 {pool.get('name')}，停止解析")
+            stop_pool = pool
+            break
+        if heading_index != current_heading:
+            current_heading = heading_index
             all_versions.append({
                 "version": version_number,
                 "phase": phase,
-                "pools": pools
+                "pools": []
             })
+        all_versions[-1]["pools"].append(pool)
     
-    # 按版本号排序（从新到旧）
-    all_versions.sort(
-        key=lambda x: [int(part) for part in x['version'].split('.')],
-        reverse=True
-    )
+    observe_stage("zzz", "extract", extract_start)
     
-    # 只保留最新的版本
-    latest_versions = all_versions[:MAX_VERSIONS]
+    # 按版本号排序（从新到旧）
+    with timed("group", "zzz"):
+        all_versions.sort(key=zzz_version_sort_key, reverse=True)
+        # 只保留最新的版本
+        latest_versions = all_versions[:MAX_VERSIONS]
     
-    return latest_versions
+    return latest_versions if known is None else (latest_versions, stop_pool)
 
-# ==================== API接口 ====================
+# ==================== 响应缓存 ====================
 
-@app.route('/api/genshin', methods=['GET'])
-def get_genshin_data():
-    """API端点，返回原神卡池信息"""
-    result = fetch_genshin_gacha_data()
-    if isinstance(result, dict) and 'error' in result:
-        return jsonify({"error": result['error']}), 500
-    return jsonify(result)
+GAME_FETCHERS = {
+    "genshin": fetch_genshin_gacha_data,
+    "hsr": fetch_hsr_wish_data,
+    "zzz": get_zzz_gacha_data,
+}
 
-@app.route('/api/hsr', methods=['GET'])
-def get_hsr_data():
-    """API端点，返回星穹铁道卡池信息"""
-    result = fetch_hsr_wish_data()
-    if isinstance(result, dict) and 'error' in result:
-        return jsonify({"error": result['error']}), 500
-    return jsonify(result)
+# 每个游戏一个缓存条目: {"data": ..., "fetched_at": ..., "last_attempt": ...}
+_cache = {}
+_cache_lock = threading.Lock()
+# 正在进行的抓取任务: game -> Future，同一游戏同一时间只有一个
+_inflight = {}
+_refresh_executor = ThreadPoolExecutor(max_workers=len(GAME_FETCHERS), thread_name_prefix="gacha-refresh")
 
-@app.route('/api/zzz', methods=['GET'])
-def get_zzz_data():
-    """API端点，返回绝区零卡池信息"""
-    result = get_zzz_gacha_data()
-    if isinstance(result, dict) and 'error' in result:
-        return jsonify({"error": result['error']}), 500
-    return jsonify(result)
+# 数据刷新回调: func(game, data)，每次获得新数据时调用一次
+_refresh_hooks = []
+# 每个游戏用磁盘快照预热的数据对象（见 seed_cache_from_snapshot）
+_seeded_data = {}
 
-@app.route('/api/all', methods=['GET'])
-def get_all_data():
-    """API端点，返回所有游戏的卡池信息"""
-    genshin_data = fetch_genshin_gacha_data()
-    hsr_data = fetch_hsr_wish_data()
-    zzz_data = get_zzz_gacha_data()
-    
-    return jsonify({
-        "last_updated": datetime.now().isoformat(),
-        "genshin": genshin_data,
-        "hsr": hsr_data,
-        "zzz": zzz_data
-    })
+def is_error_result(result):
+    """判断抓取结果是否为错误"""
+    return isinstance(result, dict) and 'error' in result
 
-@app.route('/health', methods=['GET'])
-def health_check():
-    """健康检查接口"""
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+def on_data_refresh(func):
+    """注册数据刷新回调（装饰器）"""
+    _refresh_hooks.append(func)
+    return func
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description='卡池追踪器合并项目')
+def is_seeded_data(game, data):
+    """data 是否是预热用的磁盘快照（可能比上次记录的数据旧），而不是新抓取的数据"""
+    return _seeded_data.get(game) is data
+
+def notify_data_refresh(game, data):
+    """通知所有回调某个游戏的数据已更新"""
+    for hook in _refresh_hooks:
+        try:
+            hook(game, data)
+        except Exception as e:
+            print(f"数据刷新回调 {hook.__name__} 出错: {e}")
+
+def _run_refresh(game):
+    """抓取数据并写入缓存，只在刷新线程池中执行"""
+    start = time.perf_counter()
+    try:
+        result = GAME_FETCHERS[game]()
+    except Exception as e:
+        print(f"刷新 {game} 数据出错: {e}")
+        result = {"error": f"刷新数据失败: {str(e)}"}
+    observe("gacha_refresh_duration_seconds", time.perf_counter() - start, game=game)
+    inc_counter("gacha_refresh_total", game=game, result="error" if is_error_result(result) else "ok")
+    
+    with _cache_lock:
+        entry = _cache.setdefault(game, {})
+        entry["last_attempt"] = time.time()
+        if not is_error_result(result):
+            entry["data"] = result
+            entry["fetched_at"] = entry["last_attempt"]
+            entry.pop("failed_at", None)
+        else:
+            # 保留上次成功的数据继续提供，并标记为过期
+            entry["failed_at"] = entry["last_attempt"]
+        has_data = "data" in entry
+        _inflight.pop(game, None)
+    
+    if not is_error_result(result):
+        notify_data_refresh(game, result)
+    elif not has_data:
+        # 从未成功过时退回磁盘上的快照
+        seed_cache_from_snapshot(game)
+    return result
+
+def seed_cache_from_snapshot(game):
+    """缓存中没有数据时用磁盘快照填充，缓存年龄按文件修改时间计算，返回是否填充"""
+    data = load_previous_snapshot(game)
+    if data is None:
+        return False
+    mtime = os.path.getmtime(os.path.join(SNAPSHOT_DIR, SNAPSHOT_FILES[game]))
+    with _cache_lock:
+        entry = _cache.setdefault(game, {})
+        if "data" in entry:
+            return False
+        entry["data"] = data
+        entry["fetched_at"] = mtime
+        _seeded_data[game] = data
+    notify_data_refresh(game, data)
+    return True
+
+def refresh_failed_at(game):
+    """最近一次刷新失败的时间，之后还没有成功刷新过时返回时间戳，否则返回 None"""
+    with _cache_lock:
+        return _cache.get(game, {}).get("failed_at")
+
+def mark_stale(response, games):
+    """games 中有游戏刷新失败、返回的是旧数据时添加过期响应头"""
+    failed = [game for game in games if refresh_failed_at(game) is not None]
+    if failed:
+        response.headers['X-Data-Stale'] = ",".join(failed)
+        response.headers['Warning'] = '110 - "Response is Stale"'
+    return response
+
+def request_refresh(game):
+    """请求刷新某个游戏的数据，返回 Future
+    
+    已有刷新在进行时直接返回同一个 Future，并发请求合并为一次抓取。
+    """
+    with _cache_lock:
+        future = _inflight.get(game)
+        if future is None:
+            future = _refresh_executor.submit(_run_refresh, game)
+            _inflight[game] = future
+        return future
+
+def refresh_game_data(game):
+    """重新抓取指定游戏数据并写入缓存，失败时保留旧数据"""
+    return request_refresh(game).result()
+
+def _lookup_cached_data(game):
+    """查询缓存数据，返回 (数据, 缓存年龄秒数, 缓存状态)
+    
+    缓存未过期时直接返回；过期后仍返回旧数据，并请求一次后台刷新；
+    没有任何缓存时等待正在进行的抓取。请求线程本身从不抓取页面。
+    快照模式下直接返回快照文件内容。
+    """
+    if SERVE_SNAPSHOTS:
+        snapshot = get_snapshot(game)
+        if snapshot is None:
+            return {"error": f"快照文件不存在: {SNAPSHOT_FILES[game]}"}, 0.0, "SNAPSHOT"
+        return snapshot["data"], time.time() - snapshot["mtime"], "SNAPSHOT"
+    
+    with _cache_lock:
+        entry = _cache.get(game)
+        cached = entry.get("data") if entry else None
+        age = time.time() - entry["fetched_at"] if cached is not None else 0.0
+    
+    if cached is not None:
+        if age < CACHE_TTL:
+            return cached, age, "HIT"
+        request_refresh(game)
+        return cached, age, "STALE"
+    
+    # 冷启动：等待唯一的抓取任务，避免重复请求维基
+    result = request_refresh(game).result()
+    if is_error_result(result):
+        # 抓取失败时可能已退回快照数据
+        with _cache_lock:
+            entry = _cache.get(game, {})
+            if "data" in entry:
+                return entry["data"], time.time() - entry["fetched_at"], "STALE"
+    return result, 0.0, "MISS"
+
+def get_cached_data(game):
+    """获取缓存数据，返回 (数据, 缓存年龄秒数, 缓存状态)，并记录缓存命中情况"""
+    data, age, status = _lookup_cached_data(game)
+    inc_counter("gacha_cache_lookups_total", game=game, status=status)
+    return data, age, status
+
+def cached_game_response(game):
+    """返回带缓存年龄的游戏数据响应"""
+    if any(param in request.args for param in FILTER_PARAMS):
+        return filtered_game_response(game)
+    if SERVE_SNAPSHOTS:
+        return snapshot_response(game)
+    data, age, status = get_cached_data(game)
+    if is_error_result(data):
+        return jsonify({"error": data['error']}), 500
+    response = payload_response(get_payload(game, data))
+    response.headers['Age'] = str(int(age))
+    response.headers['X-Cache'] = status
+    return mark_stale(response, [game])
+
+# ==================== 响应编码 ====================
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+# br 压缩质量：11 压缩 /api/all（约 50 KB）要 140 ms，5 只要约 1.5 ms，体积大约 9%；
+# 写入文件的编码只压缩一次，由所有工作进程共用（见 write_payload_files），使用最高质量
+BROTLI_QUALITY = 5
+SNAPSHOT_BROTLI_QUALITY = 11
+
+# 每个游戏预先序列化好的响应: game -> payload（见 build_payload）
+_payloads = {}
+# /api/all 预先序列化好的响应（见 get_all_payload），快照模式下为 (各快照 ETag, payload)；
+# 生成时加锁，生成后整体替换引用，读取时不加锁
+_all_payload = None
+_all_snapshot_payload = None
+_all_payload_lock = threading.Lock()
+
+def serialize_json(data):
+    """紧凑 JSON（无缩进，中文不转义）"""
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def build_payload(data, mtime=None, body=None, brotli_quality=BROTLI_QUALITY):
+    """把数据一次性序列化为 JSON、gzip、brotli 以及 msgpack 等各种编码"""
+    if body is None:
+        body = serialize_json(data)
+    variants = {
+        ("json", "identity"): body,
+        ("json", "gzip"): gzip.compress(body, compresslevel=9, mtime=0),
+    }
+    if brotli is not None:
+        variants[("json", "br")] = brotli.compress(body, quality=brotli_quality)
+    if msgpack is not None:
+        packed = msgpack.packb(data, use_bin_type=True)
+        variants[("msgpack", "identity")] = packed
+        variants[("msgpack", "gzip")] = gzip.compress(packed, compresslevel=9, mtime=0)
+    return {
+        "source": data,
+        "etag": hashlib.sha1(body).hexdigest(),
+        "mtime": mtime if mtime is not None else time.time(),
+        "variants": variants,
+    }
+
+def get_payload(game, data, mtime=None):
+    """获取与当前数据一致的预序列化响应，数据变化时重新生成"""
+    payload = _payloads.get(game)
+    if payload is None or payload["source"] is not data:
+        with timed("serialize", game):
+            payload = build_payload(data, mtime)
+        _payloads[game] = payload
+    return payload
+
+@on_data_refresh
+def refresh_payload(game, data):
+    """数据刷新时预先生成各种编码"""
+    get_payload(game, data)
+
+def get_all_payload(results):
+    """获取与三个游戏当前数据一致的 /api/all 响应，数据变化时重新生成（并发请求只生成一次）"""
+    global _all_payload
+    payload = _all_payload
+    if payload is not None and all(payload["source"][game] is results[game] for game in GAME_FETCHERS):
+        return payload
+    with _all_payload_lock:
+        payload = _all_payload
+        if payload is None or any(payload["source"][game] is not results[game] for game in GAME_FETCHERS):
+            with timed("serialize", "all"):
+                payload = build_payload({
+                    "last_updated": datetime.now().isoformat(),
+                    "genshin": results["genshin"],
+                    "hsr": results["hsr"],
+                    "zzz": results["zzz"]
+                })
+            _all_payload = payload
+    return payload
+
+@on_data_refresh
+def refresh_all_payload(game, data):
+    """数据刷新时预先生成 /api/all 的响应（三个游戏都已有数据时），请求线程直接复用"""
+    if SERVE_SNAPSHOTS:
+        snapshots = {game: _snapshots.get(game) for game in SNAPSHOT_FILES}
+        if all(snapshot is not None for snapshot in snapshots.values()):
+            get_all_snapshot_payload(snapshots)
+        return
+    with _cache_lock:
+        results = {game: _cache.get(game, {}).get("data") for game in GAME_FETCHERS}
+    if all(result is not None for result in results.values()):
+        get_all_payload(results)
+
+def payload_response(payload, status=200):
+    """根据 Accept/Accept-Encoding 选择预序列化的响应，支持 ETag 和 304"""
+    fmt = "json"
+    if ("msgpack", "identity") in payload["variants"]:
+        best = request.accept_mimetypes.best_match(('application/json',) + MSGPACK_MIMETYPES)
+        if best in MSGPACK_MIMETYPES:
+            fmt = "msgpack"
+    
+    encodings = [encoding for (variant_fmt, encoding) in payload["variants"]
+                 if variant_fmt == fmt and encoding != "identity"]
+    encodings.sort(key=lambda encoding: encoding != "br")  # 同等权重时优先 br
+    encoding = request.accept_encodings.best_match(encodings + ["identity"]) or "identity"
+    
+    mimetype = 'application/json' if fmt == "json" else MSGPACK_MIMETYPES[0]
+    body = payload["variants"][(fmt, encoding)]
+    if isinstance(body, mmap.mmap):
+        # 映射的编码文件分块发送，不在进程内复制整个文件
+        response = Response(iter_mapped_chunks(body), status=status, mimetype=mimetype, direct_passthrough=True)
+        response.content_length = len(body)
+    else:
+        response = Response(body, status=status, mimetype=mimetype)
+    if encoding != "identity":
+        response.headers['Content-Encoding'] = encoding
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    response.set_etag(f"{payload['etag']}-{fmt}-{encoding}")
+    response.last_modified = payload["mtime"]
+    if status != 200:
+        return response
+    return response.make_conditional(request)
+
+# ==================== 快照服务 ====================
+
+SNAPSHOT_FILES = {
+    "genshin": os.path.join("genshin", "gacha_data.json"),
+    "hsr": os.path.join("hsr", "gacha_data.json"),
+    "zzz": os.path.join("zzz", "gacha_data.json"),
+}
+
+# 每个游戏一个快照: {"mtime", "body", "data", "etag", "payload"}
+_snapshots = {}
+_snapshot_lock = threading.Lock()
+
+# 快照旁预先生成的编码文件（见 write_payload_files），文件名带 JSON 的 ETag，
+# 例如 hsr/gacha_data.<etag>.json.br；/api/all 的编码文件以 ALL_PAYLOAD_FILE 命名
+PAYLOAD_FILE_SUFFIXES = {
+    ("json", "gzip"): ".json.gz",
+    ("json", "br"): ".json.br",
+    ("msgpack", "identity"): ".msgpack",
+    ("msgpack", "gzip"): ".msgpack.gz",
+}
+ALL_PAYLOAD_FILE = "gacha_data_all.json"
+MAPPED_CHUNK_SIZE = 64 * 1024
+
+def payload_file_path(path, etag, variant):
+    """快照 path 的某种编码在 ETag 为 etag 时的文件路径"""
+    return f"{os.path.splitext(path)[0]}.{etag}{PAYLOAD_FILE_SUFFIXES[variant]}"
+
+def write_payload_files(path, payload):
+    """把 JSON 以外的各种编码写到快照 path 旁，并删除其他 ETag 的编码文件
+    
+    由刷新进程在写入快照之前调用，工作进程加载快照时直接映射这些文件（见 map_payload_files），
+    不必各自再压缩一遍。已被映射的旧文件删除后映射仍然有效。
+    """
+    keep = set()
+    for variant, body in payload["variants"].items():
+        if variant in PAYLOAD_FILE_SUFFIXES:
+            variant_path = payload_file_path(path, payload["etag"], variant)
+            if not os.path.exists(variant_path):
+                _atomic_write(variant_path, body)
+            keep.add(os.path.basename(variant_path))
+    directory = os.path.dirname(path) or "."
+    prefix = os.path.basename(os.path.splitext(path)[0]) + "."
+    for name in os.listdir(directory):
+        if (name.startswith(prefix) and name not in keep
+                and name.endswith(tuple(PAYLOAD_FILE_SUFFIXES.values()))):
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(directory, name))
+
+def map_payload_files(path, data, mtime, body):
+    """用快照 path 旁预先生成的编码文件组成响应，没有与 body 对应的文件时返回 None"""
+    etag = hashlib.sha1(body).hexdigest()
+    variants = {("json", "identity"): body}
+    for variant in PAYLOAD_FILE_SUFFIXES:
+        try:
+            with open(payload_file_path(path, etag, variant), 'rb') as f:
+                variants[variant] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            continue
+    if ("json", "gzip") not in variants:
+        return None
+    return {"source": data, "etag": etag, "mtime": mtime, "variants": variants}
+
+def iter_mapped_chunks(buf):
+    """分块读取映射的文件"""
+    for start in range(0, len(buf), MAPPED_CHUNK_SIZE):
+        yield buf[start:start + MAPPED_CHUNK_SIZE]
+
+def load_snapshot(game):
+    """读取快照文件，保留原始字节用于直接响应"""
+    path = os.path.join(SNAPSHOT_DIR, SNAPSHOT_FILES[game])
+    with open(path, 'rb') as f:
+        mtime = os.fstat(f.fileno()).st_mtime
+        body = f.read()
+    data = json.loads(body)
+    snapshot = {
+        "mtime": mtime,
+        "body": body,
+        "data": data,
+        "etag": hashlib.sha1(body).hexdigest(),
+    }
+    payload = map_payload_files(path, data, mtime, body)
+    if payload is None:
+        with timed("serialize", game):
+            payload = build_payload(data, mtime, body)
+    snapshot["payload"] = _payloads[game] = payload
+    print(f"已加载 {game} 快照: {path}")
+    return snapshot
+
+def get_snapshot(game):
+    """获取快照，文件修改时间变化时自动重新加载"""
+    path = os.path.join(SNAPSHOT_DIR, SNAPSHOT_FILES[game])
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return _snapshots.get(game)
+    
+    snapshot = _snapshots.get(game)
+    if snapshot is not None and snapshot["mtime"] == mtime:
+        return snapshot
+    
+    with _snapshot_lock:
+        snapshot = _snapshots.get(game)
+        if snapshot is not None and snapshot["mtime"] == mtime:
+            return snapshot
+        try:
+            snapshot = load_snapshot(game)
+        except (OSError, ValueError) as e:
+            # 文件可能正在写入，继续使用旧快照
+            print(f"加载 {game} 快照出错: {e}")
+            return snapshot
+        _snapshots[game] = snapshot
+    
+    if not is_error_result(snapshot["data"]):
+        notify_data_refresh(game, snapshot["data"])
+    return snapshot
+
+def load_all_snapshots():
+    """启动时加载所有快照"""
+    for game in SNAPSHOT_FILES:
+        get_snapshot(game)
+
+def _snapshot_payload_response(payload, status=200):
+    """返回快照的预序列化响应"""
+    response = payload_response(payload, status)
+    response.headers['Age'] = str(max(0, int(time.time() - payload["mtime"])))
+    response.headers['X-Cache'] = "SNAPSHOT"
+    return response
+
+def snapshot_response(game):
+    """快照模式下返回单个游戏数据"""
+    snapshot = get_snapshot(game)
+    if snapshot is None:
+        return jsonify({"error": f"快照文件不存在: {SNAPSHOT_FILES[game]}"}), 500
+    status = 500 if is_error_result(snapshot["data"]) else 200
+    return _snapshot_payload_response(snapshot["payload"], status)
+
+def combine_snapshots(snapshots):
+    """把各游戏的快照拼接成 /api/all 的数据，返回 (数据, 修改时间, JSON)"""
+    mtime = max(s["mtime"] for s in snapshots.values())
+    last_updated = datetime.fromtimestamp(mtime).isoformat()
+    parts = [b'{"last_updated": ' + json.dumps(last_updated).encode()]
+    for game, snapshot in snapshots.items():
+        parts.append(json.dumps(game).encode() + b': ' + snapshot["body"])
+    body = b', '.join(parts) + b'}'
+    data = {"last_updated": last_updated, **{game: s["data"] for game, s in snapshots.items()}}
+    return data, mtime, body
+
+def all_snapshots_response():
+    """快照模式下拼接所有游戏的预序列化数据"""
+    snapshots = {game: get_snapshot(game) for game in SNAPSHOT_FILES}
+    missing = [game for game, snapshot in snapshots.items() if snapshot is None]
+    if missing:
+        return jsonify({"error": f"快照文件不存在: {', '.join(missing)}"}), 500
+    
+    return _snapshot_payload_response(get_all_snapshot_payload(snapshots))
+
+def get_all_snapshot_payload(snapshots):
+    """获取与各快照一致的 /api/all 响应，快照变化时重新生成（并发请求只生成一次）"""
+    global _all_snapshot_payload
+    key = tuple(s["etag"] for s in snapshots.values())
+    cached = _all_snapshot_payload
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    with _all_payload_lock:
+        cached = _all_snapshot_payload
+        if cached is None or cached[0] != key:
+            data, mtime, body = combine_snapshots(snapshots)
+            payload = map_payload_files(os.path.join(SNAPSHOT_DIR, ALL_PAYLOAD_FILE), data, mtime, body)
+            if payload is None:
+                with timed("serialize", "all"):
+                    payload = build_payload(data, mtime, body)
+            cached = _all_snapshot_payload = (key, payload)
+    return cached[1]
+
+# ==================== 卡池索引与搜索 ====================
+
+HSR_ITEM_PATTERN = re.compile(r'[^（）]+（[^（）]*）')
+ITEM_DECORATION_PATTERN = re.compile(r'[（(][^（）()]*[）)]$')
+
+# 每个游戏的倒排索引: game -> {"source": 数据对象, "postings": {名称: [卡池记录]}, "coverage": 覆盖范围}
+_search_index = {}
+# 所有游戏合并后的有序名称列表，用于前缀查找
+_search_keys = []
+_search_lock = threading.Lock()
+
+def split_hsr_items(text):
+    """拆分星铁连在一起的物品文本，例如 "刻律德菈（同谐•风）乱破（智识•虚数）" """
+    items = [item.strip() for item in HSR_ITEM_PATTERN.findall(text)]
+    if items and "".join(items) == re.sub(r'\s+', '', text):
+        return items
+    return [text] if text else []
+
+def unified_pool(game, native, block=None):
+    """把各游戏不同结构的单个卡池转换为统一的卡池记录（绝区零需要所属版本区块）"""
+    if game == "genshin":
+        return {
+            "game": game,
+            "name": native["name"],
+            "type": native["type"],
+            "version": native["version"],
+            "start_time": native["start_time"],
+            "end_time": native["end_time"],
+            "five_stars": native["five_stars"],
+            "four_stars": native["four_stars"],
+        }
+    if game == "hsr":
+        return {
+            "game": game,
+            "name": native["five_star"],
+            "type": native["pool_type"],
+            "version": native["version"],
+            "start_time": native["start_time"],
+            "end_time": native["end_time"],
+            "five_stars": split_hsr_items(native["five_star"]),
+            "four_stars": [item for item in native["four_star"].split(", ") if item],
+        }
+    start_time, _, end_time = native.get("time", "").partition("~")
+    return {
+        "game": game,
+        "name": native.get("name", ""),
+        "type": native["type"],
+        "version": native.get("version") or block["version"] + block["phase"],
+        "start_time": start_time.strip(),
+        "end_time": end_time.strip(),
+        "five_stars": native.get("up_s", []),
+        "four_stars": native.get("up_a", []),
+    }
+
+def iter_game_pools(game, data):
+    """将各游戏不同结构的数据展开为统一的卡池记录"""
+    for block, native in _native_pools(game, data):
+        yield unified_pool(game, native, block)
+
+def normalize_item_name(item):
+    """去掉「」和结尾的 (元素)/（属性） 等修饰"""
+    name = item.strip().strip("「」").strip()
+    name = ITEM_DECORATION_PATTERN.sub('', name).strip()
+    return name.casefold()
+
+def item_search_keys(item):
+    """物品的索引名称：完整名称，以及「称号·名字」中 · 后面的名字"""
+    name = normalize_item_name(item)
+    keys = {name} if name else set()
+    for separator in ('·', '•'):
+        if separator in name:
+            short_name = name.rsplit(separator, 1)[1].strip()
+            if short_name:
+                keys.add(short_name)
+    return keys
+
+def build_search_index(game, data):
+    """为一个游戏的数据建立倒排索引（包含历史数据库中更早的卡池，见 covered_pools）"""
+    covered = covered_pools(game, data)
+    postings = {}
+    for pool in covered["pools"]:
+        for rarity, items in ((5, pool["five_stars"]), (4, pool["four_stars"])):
+            for item in items:
+                posting = {
+                    "game": game,
+                    "item": item,
+                    "rarity": rarity,
+                    "pool": pool["name"],
+                    "type": pool["type"],
+                    "version": pool["version"],
+                    "start_time": pool["start_time"],
+                    "end_time": pool["end_time"],
+                }
+                for key in item_search_keys(item):
+                    postings.setdefault(key, []).append(posting)
+    return {"source": data, "postings": postings, "coverage": covered["coverage"]}
+
+@on_data_refresh
+def refresh_search_index(game, data):
+    """数据刷新时重建该游戏的索引和合并后的名称列表"""
+    global _search_keys
+    index = build_search_index(game, data)
+    with _search_lock:
+        _search_index[game] = index
+        _search_keys = sorted({key for entry in _search_index.values() for key in entry["postings"]})
+
+def search_items(query, games=None, limit=50):
+    """按名称前缀查找物品出现过的卡池"""
+    prefix = normalize_item_name(query)
+    if not prefix:
+        return []
+    
+    with _search_lock:
+        keys = _search_keys
+        indexes = dict(_search_index)
+    
+    results = []
+    seen = set()
+    position = bisect.bisect_left(keys, prefix)
+    while position < len(keys) and keys[position].startswith(prefix):
+        for game, index in indexes.items():
+            if games and game not in games:
+                continue
+            for posting in index["postings"].get(keys[position], []):
+                key = (posting["game"], posting["pool"], posting["start_time"], posting["item"])
+                if key not in seen:
+                    seen.add(key)
+                    results.append(posting)
+        position += 1
+        if len(results) >= limit:
+            break
+    
+    return results[:limit]
+
+def search_coverage(games):
+    """各游戏索引覆盖的卡池范围"""
+    with _search_lock:
+        return {game: _search_index[game]["coverage"] for game in games if game in _search_index}
+
+def ensure_search_index(games):
+    """确保各游戏的索引与当前数据一致"""
+    for game in games:
+        data, _, _ = get_cached_data(game)
+        if is_error_result(data):
+            continue
+        index = _search_index.get(game)
+        if index is None or index["source"] is not data or coverage_outdated(index["coverage"]):
+            refresh_search_index(game, data)
+
+# ==================== 筛选与分页 ====================
+
+FILTER_PARAMS = ('version', 'type', 'start', 'end', 'limit', 'cursor')
+WIKI_TIMEZONE = timezone(timedelta(hours=8))  # 维基上的时间均为北京时间
+POOL_TIME_PATTERN = re.compile(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})(?:[\sT]+(\d{1,2}):(\d{2})(?::(\d{2}))?)?')
+
+# 卡池类型别名 -> 统一类型
+POOL_TYPE_ALIASES = {
+    "角色池": "character", "character": "character", "角色": "character", "代理人": "character",
+    "武器池": "weapon", "光锥池": "weapon", "weapon": "weapon", "武器": "weapon", "光锥": "weapon", "音擎": "weapon",
+    "混池（集录）": "chronicled", "集录": "chronicled", "chronicled": "chronicled",
+}
+
+# 每个游戏的筛选索引: game -> {"source", "items", "by_version", "by_type", "start_ts", "end_ts", "latest_version"}
+_filter_index = {}
+
+def parse_pool_time(text):
+    """解析卡池时间字符串为时间戳（北京时间），无法解析时返回 None"""
+    match = POOL_TIME_PATTERN.search(text or "")
+    if not match:
+        return None
+    year, month, day, hour, minute, second = (int(part) if part else 0 for part in match.groups())
+    try:
+        return datetime(year, month, day, hour, minute, second, tzinfo=WIKI_TIMEZONE).timestamp()
+    except ValueError:
+        return None
+
+def _native_pools(game, data):
+    """按原始结构列出卡池: [(所属版本区块, 卡池)]，只有绝区零有版本区块"""
+    if game == "genshin":
+        return [(None, entry) for entry in data.get("gacha_data", [])]
+    if game == "hsr":
+        return [(None, wish) for wish in data.get("wish_data", [])]
+    return [(block, pool) for block in data for pool in block["pools"]]
+
+def build_filter_index(game, data):
+    """为一个游戏的数据建立按版本、类型筛选的索引"""
+    items = _native_pools(game, data)
+    pools = list(iter_game_pools(game, data))
+    index = {"source": data, "items": items, "by_version": {}, "by_type": {},
+             "start_ts": [], "end_ts": [], "latest_version": None}
+    
+    for position, ((block, native), pool, (start_ts, end_ts, _)) in enumerate(
+            zip(items, pools, pool_epochs(game, pools))):
+        versions = {pool["version"]}
+        if game == "genshin":
+            versions.add(native.get("version_key", ""))
+        elif game == "zzz":
+            versions.update((block["version"], block["version"] + block["phase"]))
+        if index["latest_version"] is None:
+            index["latest_version"] = pool["version"] if game != "zzz" else block["version"]
+        for version in versions:
+            if version:
+                index["by_version"].setdefault(version, []).append(position)
+        
+        type_key = POOL_TYPE_ALIASES.get(pool["type"], pool["type"])
+        index["by_type"].setdefault(type_key, []).append(position)
+        index["start_ts"].append(start_ts)
+        index["end_ts"].append(end_ts)
+    return index
+
+@on_data_refresh
+def refresh_filter_index(game, data):
+    """数据刷新时重建筛选索引"""
+    _filter_index[game] = build_filter_index(game, data)
+
+def get_filter_index(game, data):
+    """获取与当前数据一致的筛选索引"""
+    index = _filter_index.get(game)
+    if index is None or index["source"] is not data:
+        refresh_filter_index(game, data)
+        index = _filter_index[game]
+    return index
+
+def parse_query_time(value):
+    """解析查询参数中的日期，支持日期字符串和时间戳"""
+    if value.isdigit():
+        return float(value)
+    timestamp = parse_pool_time(value)
+    if timestamp is None:
+        raise ValueError(f"无法解析日期: {value}")
+    return timestamp
+
+def filter_pools(game, data, args):
+    """按查询参数筛选卡池，返回 (筛选后的数据, 匹配总数, 下一页游标)"""
+    index = get_filter_index(game, data)
+    candidates = None
+    
+    version = args.get('version')
+    if version:
+        if version == 'latest':
+            version = index["latest_version"]
+        candidates = index["by_version"].get(version, [])
+    
+    pool_type = args.get('type')
+    if pool_type:
+        type_positions = index["by_type"].get(POOL_TYPE_ALIASES.get(pool_type, pool_type), [])
+        if candidates is None:
+            candidates = type_positions
+        else:
+            type_set = set(type_positions)
+            candidates = [position for position in candidates if position in type_set]
+    
+    if candidates is None:
+        candidates = range(len(index["items"]))
+    
+    # 时间区间重叠判断，缺失的时间视为不限
+    start = parse_query_time(args['start']) if args.get('start') else None
+    end = parse_query_time(args['end']) if args.get('end') else None
+    if start is not None or end is not None:
+        candidates = [
+            position for position in candidates
+            if (start is None or index["end_ts"][position] is None or index["end_ts"][position] >= start)
+            and (end is None or index["start_ts"][position] is None or index["start_ts"][position] <= end)
+        ]
+    
+    # 游标为下一条记录在原始数据中的位置
+    total = len(candidates)
+    cursor = args.get('cursor', type=int)
+    offset = bisect.bisect_left(candidates, cursor) if cursor is not None else 0
+    limit = args.get('limit', type=int)
+    end_offset = total if limit is None else offset + max(limit, 0)
+    page = candidates[offset:end_offset]
+    next_cursor = candidates[end_offset] if end_offset < total else None
+    
+    items = [index["items"][position] for position in page]
+    if game == "genshin":
+        filtered = dict(data, gacha_data=[native for _, native in items])
+    elif game == "hsr":
+        filtered = dict(data, wish_data=[native for _, native in items])
+    else:
+        filtered = []
+        for block, pool in items:
+            if not filtered or filtered[-1]["_block"] is not block:
+                filtered.append({"_block": block, **{k: v for k, v in block.items() if k != "pools"}, "pools": []})
+            filtered[-1]["pools"].append(pool)
+        for block in filtered:
+            del block["_block"]
+    return filtered, total, next_cursor
+
+def filtered_game_response(game):
+    """返回筛选和分页后的游戏数据，分页信息放在响应头中"""
+    data, age, status = get_cached_data(game)
+    if is_error_result(data):
+        return jsonify({"error": data['error']}), 500
+    try:
+        filtered, total, next_cursor = filter_pools(game, data, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    # 与完整数据相同的紧凑 JSON，并按 Accept/Accept-Encoding 协商压缩和 msgpack
+    response = payload_response(build_payload(filtered, time.time() - age))
+    response.headers['Age'] = str(int(age))
+    response.headers['X-Cache'] = status
+    response.headers['X-Total-Count'] = str(total)
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+        args = request.args.to_dict()
+        args['cursor'] = str(next_cursor)
+        next_url = request.base_url + "?" + urlencode(args)
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    if not SERVE_SNAPSHOTS:
+        mark_stale(response, [game])
+    return response
+
+# ==================== 卡池时间 ====================
+
+VERSION_START_MARK = "版本更新后"
+VERSION_NUMBER_PATTERN = re.compile(r'(\d+)\.(\d+)')
+LUNA_VERSION_PATTERN = re.compile(r'月之([一二三四五六七八九十]+)')
+CHINESE_DIGITS = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+ACTIVE_UPCOMING_LIMIT = 20
+
+# 每个游戏带时间戳的卡池记录: game -> {"source": 数据对象, "pools": [...]}
+_time_pools = {}
+# 所有游戏合并后的区间索引（见 build_interval_index）
+_interval_index = {"bounds": [], "segments": [], "start_keys": [], "by_start": []}
+_interval_lock = threading.Lock()
+
+def version_order_key(text):
+    """版本排序键：数字版本为 (主版本, 次版本)，原神「月之N」排在所有数字版本之后"""
+    match = VERSION_NUMBER_PATTERN.search(text or "")
+    if match:
+        return (int(match.group(1)), int(match.group(2)))
+    match = LUNA_VERSION_PATTERN.search(text or "")
+    if match:
+        tens, ten, ones = match.group(1).rpartition("十")
+        number = (CHINESE_DIGITS.get(tens, 1) * 10 if ten else 0) + CHINESE_DIGITS.get(ones, 0)
+        return (999, number)
+    return None
+
+def _add_year(timestamp):
+    """时间戳加一年（北京时间）"""
+    moment = datetime.fromtimestamp(timestamp, WIKI_TIMEZONE)
+    try:
+        return moment.replace(year=moment.year + 1).timestamp()
+    except ValueError:  # 2月29日
+        return moment.replace(year=moment.year + 1, day=28).timestamp()
+
+def pool_epochs(game, pools):
+    """把统一卡池记录的开始/结束时间转换为时间戳
+    
+    返回与 pools 顺序一致的 [(start_ts, end_ts, 开始时间是否为估计值)]。
+    「X版本更新后」开始的卡池没有具体时间，用上一个版本卡池的最晚结束时间估计；
+    原神补全年份后结束时间早于开始时间的，说明跨年，结束时间属于下一年。
+    """
+    parsed = []
+    version_ends = {}
+    for pool in pools:
+        start_ts = None if VERSION_START_MARK in pool["start_time"] else parse_pool_time(pool["start_time"])
+        end_ts = parse_pool_time(pool["end_time"])
+        if start_ts is not None and end_ts is not None and end_ts < start_ts:
+            end_ts = _add_year(end_ts)
+        parsed.append((start_ts, end_ts))
+        key = version_order_key(pool["version"])
+        if key is not None and end_ts is not None:
+            version_ends[key] = max(version_ends.get(key, end_ts), end_ts)
+    
+    ordered_versions = sorted(version_ends)
+    results = []
+    for pool, (start_ts, end_ts) in zip(pools, parsed):
+        estimated = False
+        if start_ts is None and VERSION_START_MARK in pool["start_time"]:
+            key = version_order_key(pool["start_time"]) or version_order_key(pool["version"])
+            position = bisect.bisect_left(ordered_versions, key) if key is not None else 0
+            if position > 0:
+                start_ts = version_ends[ordered_versions[position - 1]]
+                estimated = True
+        results.append((start_ts, end_ts, estimated))
+    return results
+
+def build_time_pools(game, data):
+    """展开一个游戏的卡池记录并附上时间戳"""
+    pools = list(iter_game_pools(game, data))
+    for pool, (start_ts, end_ts, estimated) in zip(pools, pool_epochs(game, pools)):
+        pool.update(start_ts=start_ts, end_ts=end_ts, start_estimated=estimated)
+    return {"source": data, "pools": pools}
+
+def build_interval_index(pools):
+    """按开始/结束时间把时间轴切成基本区间，预先算好每个区间内进行中的卡池
+    
+    查询某个时刻只需在区间边界上二分查找；没有开始时间的卡池无法定位，不进入索引，
+    没有结束时间的卡池视为一直进行中。
+    """
+    pools = sorted((pool for pool in pools if pool["start_ts"] is not None),
+                   key=lambda pool: (pool["start_ts"], pool["game"]))
+    bounds = sorted({pool["start_ts"] for pool in pools} |
+                    {pool["end_ts"] + 1 for pool in pools if pool["end_ts"] is not None})
+    segments = [[] for _ in bounds]
+    for pool in pools:
+        first = bisect.bisect_left(bounds, pool["start_ts"])
+        last = bisect.bisect_left(bounds, pool["end_ts"] + 1) if pool["end_ts"] is not None else len(bounds)
+        for position in range(first, last):
+            segments[position].append(pool)
+    return {
+        "bounds": bounds,
+        "segments": segments,
+        "start_keys": [pool["start_ts"] for pool in pools],
+        "by_start": pools,
+    }
+
+@on_data_refresh
+def refresh_time_index(game, data):
+    """数据刷新时重新计算该游戏的卡池时间并重建合并的区间索引"""
+    global _interval_index
+    time_pools = build_time_pools(game, data)
+    with _interval_lock:
+        _time_pools[game] = time_pools
+        _interval_index = build_interval_index([pool for entry in _time_pools.values() for pool in entry["pools"]])
+
+def ensure_time_index(games):
+    """确保各游戏的区间索引与当前数据一致"""
+    for game in games:
+        data, _, _ = get_cached_data(game)
+        if is_error_result(data):
+            continue
+        entry = _time_pools.get(game)
+        if entry is None or entry["source"] is not data:
+            refresh_time_index(game, data)
+
+def find_active_pools(at, games=None, upcoming_limit=ACTIVE_UPCOMING_LIMIT):
+    """返回 (at 时刻进行中的卡池, 之后即将开始的卡池)"""
+    index = _interval_index
+    position = bisect.bisect_right(index["bounds"], at) - 1
+    active = index["segments"][position] if position >= 0 else []
+    upcoming = index["by_start"][bisect.bisect_right(index["start_keys"], at):]
+    if games:
+        active = [pool for pool in active if pool["game"] in games]
+        upcoming = [pool for pool in upcoming if pool["game"] in games]
+    return list(active), upcoming[:upcoming_limit]
+
+# ==================== 复刻统计 ====================
+
+DAY_SECONDS = 86400
+
+# 每个游戏预先算好的统计: game -> {"source": 数据对象, "items": {规范化名称: 统计},
+#                                   "aliases": {索引名称: [规范化名称]}, "coverage": 覆盖范围,
+#                                   "payload": 预序列化响应}
+_stats = {}
+# 多个游戏合并后的统计: (各游戏统计的标识, payload, 各游戏统计)，整体替换引用
+_stats_all_payload = None
+_stats_lock = threading.Lock()
+
+def _days(seconds):
+    return round(seconds / DAY_SECONDS, 1)
+
+def build_item_stats(game, pools, now=None):
+    """统计每个五星物品的全部 UP 记录、距上次 UP 的天数、平均复刻间隔和同期四星
+    
+    pools 为带 start_ts/end_ts 的统一卡池记录（见 build_time_pools）。
+    返回 {规范化名称: 统计}，按上次 UP 时间从近到远排列。
+    """
+    now = time.time() if now is None else now
+    runs = {}
+    names = {}
+    co_featured = {}
+    for pool in pools:
+        for item in pool["five_stars"]:
+            key = normalize_item_name(item)
+            if not key:
+                continue
+            names.setdefault(key, item)
+            item_runs = runs.setdefault(key, {})
+            # 同一卡池在原始数据中可能出现多次
+            item_runs.setdefault(pool_key(pool), pool)
+            counts = co_featured.setdefault(key, {})
+            for four_star in pool["four_stars"]:
+                counts[four_star] = counts.get(four_star, 0) + 1
+    
+    stats = {}
+    latest = {}
+    for key, item_runs in runs.items():
+        ordered = sorted(item_runs.values(), key=run_order_key)
+        starts = [pool["start_ts"] for pool in ordered if pool["start_ts"] is not None]
+        intervals = [_days(later - earlier) for earlier, later in zip(starts, starts[1:])]
+        # 最早版本的「X版本更新后」卡池没有可估计的开始时间，按结束时间取最近一次
+        last = max(reversed(ordered), key=run_end_key)
+        latest[key] = run_end_key(last)
+        started = last["start_ts"] is None or last["start_ts"] <= now
+        active = started and (last["end_ts"] is None or now <= last["end_ts"])
+        if active or last["end_ts"] is None or last["end_ts"] > now:
+            days_since = 0
+        else:
+            days_since = _days(now - last["end_ts"])
+        stats[key] = {
+            "game": game,
+            "name": names[key],
+            "run_count": len(ordered),
+            "runs": [{
+                "pool": pool["name"],
+                "type": pool["type"],
+                "version": pool["version"],
+                "start_time": pool["start_time"],
+                "end_time": pool["end_time"],
+            } for pool in ordered],
+            "first_run": ordered[0]["start_time"],
+            "last_run": last["start_time"],
+            "active": active,
+            "days_since_last_run": days_since,
+            "rerun_intervals_days": intervals,
+            "average_rerun_interval_days": round(sum(intervals) / len(intervals), 1) if intervals else None,
+            "co_featured_four_stars": [{"name": name, "count": count} for name, count in
+                                       sorted(co_featured[key].items(), key=lambda pair: (-pair[1], pair[0]))],
+        }
+    
+    return {key: stats[key] for key in sorted(stats, key=lambda key: latest[key], reverse=True)}
+
+def run_order_key(pool):
+    """UP 记录排序键：先按版本，同一版本内按开始（没有时按结束）时间"""
+    timestamp = pool["start_ts"] if pool["start_ts"] is not None else pool["end_ts"]
+    return version_order_key(pool["version"]) or (0, 0), timestamp if timestamp is not None else 0
+
+def run_end_key(pool):
+    """UP 记录的结束时间，没有结束时间的视为仍在进行"""
+    if pool["end_ts"] is not None:
+        return pool["end_ts"]
+    return float("inf") if pool["start_ts"] is not None else float("-inf")
+
+def stats_document(game, items, generated_at, coverage):
+    return {"game": game, "generated_at": generated_at, "coverage": coverage, "items": list(items.values())}
+
+@on_data_refresh
+def refresh_stats(game, data):
+    """数据刷新时重新计算该游戏的复刻统计并预先序列化
+    
+    统计基于 covered_pools：有历史数据库时包含其中出现过的全部卡池，否则只有接口数据中
+    最近的 MAX_VERSIONS 个版本，覆盖范围写在结果的 coverage 中。
+    """
+    covered = covered_pools(game, data)
+    items = build_item_stats(game, covered["pools"])
+    generated_at = datetime.now().isoformat()
+    payload = build_payload(stats_document(game, items, generated_at, covered["coverage"]))
+    aliases = {}
+    for key, item_stats in items.items():
+        for alias in item_search_keys(item_stats["name"]):
+            aliases.setdefault(alias, []).append(key)
+    with _stats_lock:
+        _stats[game] = {"source": data, "items": items, "aliases": aliases, "coverage": covered["coverage"],
+                        "generated_at": generated_at, "payload": payload}
+
+def ensure_stats(games):
+    """确保各游戏的统计与当前数据一致"""
+    for game in games:
+        data, _, _ = get_cached_data(game)
+        if is_error_result(data):
+            continue
+        entry = _stats.get(game)
+        if entry is None or entry["source"] is not data or coverage_outdated(entry["coverage"]):
+            refresh_stats(game, data)
+
+def get_stats_payload(games):
+    """单个游戏直接返回其预序列化统计，多个游戏时合并后缓存（在锁内生成，并发请求只生成一次）"""
+    global _stats_all_payload
+    with _stats_lock:
+        entries = {game: _stats[game] for game in games if game in _stats}
+        if len(games) == 1:
+            entry = entries.get(games[0])
+            return entry["payload"] if entry else None
+        key = tuple((game, id(entry["payload"])) for game, entry in entries.items())
+        cached = _stats_all_payload
+        if cached is None or cached[0] != key:
+            payload = build_payload({game: stats_document(game, entry["items"], entry["generated_at"],
+                                                          entry["coverage"])
+                                     for game, entry in entries.items()})
+            # 同时保留各游戏的统计，它们的 id 在缓存期间不会被复用
+            cached = _stats_all_payload = (key, payload, entries)
+        return cached[1]
+
+def stats_coverage(games):
+    """各游戏统计覆盖的卡池范围"""
+    with _stats_lock:
+        return {game: _stats[game]["coverage"] for game in games if game in _stats}
+
+def find_item_stats(item, games):
+    """按物品名称查找统计，名称按搜索索引的规则匹配（完整名称或 · 后面的名字）"""
+    name = normalize_item_name(item)
+    with _stats_lock:
+        return [_stats[game]["items"][key] for game in games if game in _stats
+                for key in _stats[game]["aliases"].get(name, [])]
+
+# ==================== 变更记录 ====================
+
+CHANGE_LOG_SIZE = 5000  # 最多保留的变更条数，更早的变更需要客户端重新拉取全量数据
+
+# 配置了历史数据库（HISTORY_DB_PATH）时，变更记录、版本号和卡池摘要保存在数据库中，服务重启后
+# 版本号继续递增，多进程部署中由主进程写入、工作进程只读；否则只保存在内存中。
+# 版本号从变更记录创建时的毫秒时间戳开始，服务重启（内存记录）或数据库重建后客户端持有的
+# 旧版本号小于新的起点，changes_since 据此要求客户端重新拉取全量数据。
+
+# 每个游戏当前卡池的内容摘要: game -> {卡池键: 摘要}
+_pool_hashes = {}
+# 每个游戏最近一次记录变更时的数据对象，避免同一份数据重复比较
+_change_sources = {}
+_change_log = deque(maxlen=CHANGE_LOG_SIZE)
+_change_base = int(time.time() * 1000)
+_change_revision = _change_base
+_change_loaded = False  # 是否已从数据库读取版本号和卡池摘要
+_change_lock = threading.Lock()
+
+def pool_key(pool):
+    """统一卡池记录的唯一键"""
+    return f"{pool['name']}|{pool['start_time']}"
+
+def pool_hash(pool):
+    """卡池内容摘要"""
+    return hashlib.sha1(serialize_json(pool)).hexdigest()
+
+def load_change_state(conn):
+    """读取数据库中的 (版本号起点, 当前版本号)，尚未记录过变更时返回 None"""
+    try:
+        row = conn.execute("SELECT base, revision FROM change_state WHERE id = 0").fetchone()
+    except sqlite3.OperationalError:
+        # 只读打开时主进程可能还没有建表
+        return None
+    return (row["base"], row["revision"]) if row else None
+
+def _load_change_store():
+    """首次记录变更前从数据库读取版本号和各游戏的卡池摘要（调用方持有 _change_lock）"""
+    global _change_base, _change_revision, _change_loaded
+    if _change_loaded:
+        return
+    with _history_db_lock, contextlib.closing(connect_history_db()) as conn, conn:
+        conn.execute("INSERT OR IGNORE INTO change_state (id, base, revision) VALUES (0, ?, ?)",
+                     (_change_base, _change_base))
+        _change_base, _change_revision = load_change_state(conn)
+        for row in conn.execute("SELECT game, key, hash FROM pool_hashes"):
+            _pool_hashes.setdefault(row["game"], {})[row["key"]] = row["hash"]
+    _change_loaded = True
+
+def store_changes(game, hashes, changes):
+    """把一个版本号的变更、新的版本号和该游戏的卡池摘要写入数据库，只保留最近 CHANGE_LOG_SIZE 条变更"""
+    revision = changes[0]["revision"]
+    with _history_db_lock, contextlib.closing(connect_history_db()) as conn, conn:
+        conn.executemany(
+            "INSERT INTO change_log (revision, timestamp, game, record) VALUES (?, ?, ?, ?)",
+            [(revision, change["timestamp"], game, json.dumps(change, ensure_ascii=False)) for change in changes])
+        conn.execute("DELETE FROM change_log WHERE seq <= (SELECT MAX(seq) FROM change_log) - ?", (CHANGE_LOG_SIZE,))
+        conn.execute("UPDATE change_state SET revision = ? WHERE id = 0", (revision,))
+        conn.execute("DELETE FROM pool_hashes WHERE game = ?", (game,))
+        conn.executemany("INSERT INTO pool_hashes (game, key, hash) VALUES (?, ?, ?)",
+                         [(game, key, digest) for key, digest in hashes.items()])
+
+@on_data_refresh
+def record_changes(game, data):
+    """与上次数据逐个卡池比较，记录新增、修改和删除；有变化时版本号加一
+    
+    变更记录保存在数据库中时，只读模式（多进程部署的工作进程）下不记录。预热用的磁盘快照
+    可能比上次记录的数据旧，不产生变更，只在还没有比较基准时作为基准。
+    返回本次记录的变更列表。
+    """
+    global _change_revision
+    if HISTORY_DB_PATH and HISTORY_DB_READONLY:
+        return []
+    pools = {pool_key(pool): pool for pool in iter_game_pools(game, data)}
+    hashes = {key: pool_hash(pool) for key, pool in pools.items()}
+    
+    with _change_lock:
+        if _change_sources.get(game) is data:
+            return []
+        if HISTORY_DB_PATH:
+            _load_change_store()
+        if is_seeded_data(game, data):
+            _change_sources[game] = data
+            _pool_hashes.setdefault(game, hashes)
+            return []
+        previous = _pool_hashes.get(game, {})
+        
+        changes = []
+        for key, digest in hashes.items():
+            if key not in previous:
+                changes.append({"op": "insert", "game": game, "key": key, "hash": digest, "pool": pools[key]})
+            elif previous[key] != digest:
+                changes.append({"op": "update", "game": game, "key": key, "hash": digest, "pool": pools[key]})
+        for key in previous:
+            if key not in hashes:
+                changes.append({"op": "remove", "game": game, "key": key, "hash": None, "pool": None})
+        if changes:
+            timestamp = time.time()
+            for change in changes:
+                change.update(revision=_change_revision + 1, timestamp=timestamp)
+            if HISTORY_DB_PATH:
+                store_changes(game, hashes, changes)
+            _change_revision += 1
+            _change_log.extend(changes)
+            # 在锁内推送，保证订阅者收到的版本号有序
+            publish_changes(changes)
+        _change_sources[game] = data
+        _pool_hashes[game] = hashes
+    
+    if changes:
+        print(f"{game} 数据变更 {len(changes)} 处，版本号 {changes[0]['revision']}")
+    return changes
+
+def ensure_change_feed(games):
+    """确保变更记录已包含各游戏的当前数据"""
+    for game in games:
+        data, _, _ = get_cached_data(game)
+        if not is_error_result(data) and _change_sources.get(game) is not data:
+            record_changes(game, data)
+
+def read_stored_changes(revision=None, timestamp=None):
+    """从数据库读取变更记录，返回 (版本号起点, 当前版本号, 记录已满时最早的变更, 之后的变更列表)
+    
+    数据库还没有变更记录（或只读打开时文件不存在）时没有变更，版本号为本进程的起点。
+    """
+    try:
+        with contextlib.closing(connect_history_db(readonly=HISTORY_DB_READONLY)) as conn:
+            state = load_change_state(conn)
+            if state is None:
+                return _change_base, _change_base, None, []
+            oldest = None
+            if conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] >= CHANGE_LOG_SIZE:
+                oldest = json.loads(conn.execute("SELECT record FROM change_log ORDER BY seq LIMIT 1").fetchone()[0])
+            if revision is not None:
+                rows = conn.execute("SELECT record FROM change_log WHERE revision > ? ORDER BY seq", (revision,))
+            else:
+                rows = conn.execute("SELECT record FROM change_log WHERE timestamp > ? ORDER BY seq", (timestamp or 0,))
+            changes = [json.loads(row[0]) for row in rows]
+    except sqlite3.OperationalError as e:
+        print(f"读取变更记录出错: {e}")
+        return _change_base, _change_base, None, []
+    return state[0], state[1], oldest, changes
+
+def current_revision():
+    """当前版本号"""
+    if not HISTORY_DB_PATH:
+        return _change_revision
+    try:
+        with contextlib.closing(connect_history_db(readonly=HISTORY_DB_READONLY)) as conn:
+            state = load_change_state(conn)
+    except sqlite3.OperationalError:
+        state = None
+    return state[1] if state else _change_base
+
+def changes_since(revision=None, timestamp=None, games=None):
+    """返回 (当前版本号, 是否需要重新拉取全量数据, 之后的变更列表)
+    
+    请求的版本号或时间早于保留的最早变更、版本号小于变更记录的起点（服务重启后的内存记录
+    或重建的数据库）或大于当前值时，reset 为 True，客户端应丢弃本地数据重新拉取全量接口。
+    """
+    if HISTORY_DB_PATH:
+        base, current, oldest, changes = read_stored_changes(revision, timestamp)
+    else:
+        with _change_lock:
+            base, current = _change_base, _change_revision
+            log = list(_change_log)
+        # 记录已满时最早的版本可能只剩部分变更
+        oldest = log[0] if len(log) == CHANGE_LOG_SIZE else None
+        if revision is not None:
+            changes = [change for change in log if change["revision"] > revision]
+        else:
+            changes = [change for change in log if change["timestamp"] > (timestamp or 0)]
+    if revision is not None:
+        reset = revision < base or revision > current or (oldest is not None and revision < oldest["revision"])
+    else:
+        reset = oldest is not None and (timestamp or 0) < oldest["timestamp"]
+    if games:
+        changes = [change for change in changes if change["game"] in games]
+    return current, reset, changes
+
+# ==================== 事件推送 ====================
+
+SSE_QUEUE_SIZE = 32  # 每个订阅者最多积压的事件数，超过后断开该订阅者
+SSE_HEARTBEAT = 15  # 心跳间隔（秒），保持连接不被代理关闭
+SSE_MAX_SUBSCRIBERS = 200
+
+# 订阅者: {"queue": queue.Queue, "games": 关注的游戏集合或 None, "dropped": bool}
+_subscribers = []
+_subscribers_lock = threading.Lock()
+
+def format_sse(data, event=None, event_id=None):
+    """格式化一条 Server-Sent Events 消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    return "\n".join(lines) + "\n\n"
+
+def publish_changes(changes):
+    """把一次刷新的变更推送给所有订阅者，队列已满的订阅者被断开"""
+    with _subscribers_lock:
+        for subscriber in list(_subscribers):
+            relevant = [change for change in changes
+                        if subscriber["games"] is None or change["game"] in subscriber["games"]]
+            if not relevant:
+                continue
+            try:
+                subscriber["queue"].put_nowait(relevant)
+            except queue.Full:
+                subscriber["dropped"] = True
+                _subscribers.remove(subscriber)
+
+def subscribe(games=None):
+    """注册订阅者，超过订阅者上限时返回 None"""
+    subscriber = {"queue": queue.Queue(maxsize=SSE_QUEUE_SIZE), "games": games, "dropped": False}
+    with _subscribers_lock:
+        if len(_subscribers) >= SSE_MAX_SUBSCRIBERS:
+            return None
+        _subscribers.append(subscriber)
+    return subscriber
+
+def unsubscribe(subscriber):
+    with _subscribers_lock:
+        if subscriber in _subscribers:
+            _subscribers.remove(subscriber)
+
+def change_event(changes):
+    """一个版本号的变更合并为一条事件"""
+    revision = changes[0]["revision"]
+    return format_sse({"revision": revision, "changes": changes}, "change", revision)
+
+def event_stream(subscriber, last_event_id=None):
+    """订阅者的事件流：先补发 Last-Event-ID 之后的变更，再推送新的变更"""
+    try:
+        last_sent = last_event_id
+        if last_event_id is not None:
+            current, reset, missed = changes_since(last_event_id, games=subscriber["games"])
+            if reset:
+                yield format_sse({"revision": current}, "reset", current)
+                last_sent = current
+            else:
+                by_revision = {}
+                for change in missed:
+                    by_revision.setdefault(change["revision"], []).append(change)
+                for revision in sorted(by_revision):
+                    yield change_event(by_revision[revision])
+                    last_sent = revision
+        else:
+            last_sent = current_revision()
+            yield format_sse({"revision": last_sent}, "hello", last_sent)
+        
+        while not subscriber["dropped"]:
+            try:
+                changes = subscriber["queue"].get(timeout=SSE_HEARTBEAT)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                continue
+            if last_sent is not None and changes[0]["revision"] <= last_sent:
+                continue  # 补发时已经发送过
+            yield change_event(changes)
+            last_sent = changes[0]["revision"]
+        
+        # 消费过慢被断开，客户端带上 Last-Event-ID 重连即可补发
+        yield format_sse({"reason": "slow consumer"}, "dropped")
+    finally:
+        unsubscribe(subscriber)
+
+SNAPSHOT_WATCH_INTERVAL = 1  # 快照模式下检查快照文件和变更记录的间隔（秒）
+
+_watcher_stop = threading.Event()
+_watcher_thread = None
+
+def publish_stored_changes(after):
+    """把数据库中版本号 after 之后的变更按版本号推送给订阅者，返回当前版本号"""
+    _, current, _, changes = read_stored_changes(after)
+    by_revision = {}
+    for change in changes:
+        by_revision.setdefault(change["revision"], []).append(change)
+    for revision in sorted(by_revision):
+        publish_changes(by_revision[revision])
+    # 读取失败时 current 为本进程的起点，不回退，避免下次重复推送
+    return max(after, current)
+
+def run_snapshot_watcher(stop_event):
+    """快照模式的后台循环：快照文件修改时间变化时重新加载（触发刷新回调，内存中的变更记录
+    由此推送），变更记录在数据库中且只读时推送其他进程写入的新变更
+    
+    多进程部署的工作进程不抓取页面，没有请求时只能由这个循环发现数据更新。
+    """
+    revision = current_revision()
+    while not stop_event.wait(SNAPSHOT_WATCH_INTERVAL):
+        for game in SNAPSHOT_FILES:
+            get_snapshot(game)
+        if HISTORY_DB_PATH and HISTORY_DB_READONLY:
+            revision = publish_stored_changes(revision)
+
+def start_snapshot_watcher():
+    """启动快照监视线程（重复调用无效）"""
+    global _watcher_thread
+    if _watcher_thread is not None and _watcher_thread.is_alive():
+        return _watcher_thread
+    _watcher_stop.clear()
+    _watcher_thread = threading.Thread(target=run_snapshot_watcher, args=(_watcher_stop,),
+                                       name="gacha-snapshot-watcher", daemon=True)
+    _watcher_thread.start()
+    return _watcher_thread
+
+def stop_snapshot_watcher():
+    """停止快照监视线程"""
+    _watcher_stop.set()
+
+# ==================== 流式提取 ====================
+
+class BlockExtractor(HTMLParser):
+    """增量解析 HTML，只保留选中元素的标记，元素结束时放入 blocks
+    
+    select(tag, classes, ancestors) 决定是否从该元素开始截取，ancestors 为外层
+    div/table/标题元素的 [(标签, class 集合)]。截取期间不再判断内层元素，
+    内存中只有当前截取的元素和 HTMLParser 尚未处理的少量输入。
+    """
+    TRACKED_TAGS = frozenset({'div', 'table', 'h2', 'h3', 'h4'})
+    
+    def __init__(self, select):
+        super().__init__(convert_charrefs=True)
+        self.select = select
+        self.ancestors = []
+        self.blocks = []
+        self._pieces = None
+        self._depth = None
+        self._tag = None
+    
+    def handle_starttag(self, tag, attrs):
+        if self._pieces is not None:
+            self._pieces.append(self.get_starttag_text())
+        if tag not in self.TRACKED_TAGS:
+            return
+        classes = set()
+        for name, value in attrs:
+            if name == 'class' and value:
+                classes.update(value.split())
+        if self._pieces is None and self.select(tag, classes, self.ancestors):
+            self._pieces = [self.get_starttag_text()]
+            self._depth = len(self.ancestors)
+            self._tag = tag
+        self.ancestors.append((tag, classes))
+    
+    def handle_startendtag(self, tag, attrs):
+        if self._pieces is not None:
+            self._pieces.append(self.get_starttag_text())
+    
+    def handle_endtag(self, tag):
+        if self._pieces is not None:
+            self._pieces.append(f"</{tag}>")
+        if tag not in self.TRACKED_TAGS:
+            return
+        # 容忍未闭合的内层元素：弹出到最近的同名元素
+        for position in range(len(self.ancestors) - 1, -1, -1):
+            if self.ancestors[position][0] == tag:
+                del self.ancestors[position:]
+                break
+        if self._pieces is not None and len(self.ancestors) <= self._depth:
+            self.blocks.append((self._tag, "".join(self._pieces)))
+            self._pieces = self._depth = self._tag = None
+    
+    def handle_data(self, data):
+        if self._pieces is not None:
+            self._pieces.append(html_escape(data, quote=False))
+
+def iter_page_blocks(chunks, select, parser=None):
+    """把页面字节块送入 BlockExtractor，每个选中元素结束时产出 (标签, 该元素的 soup 节点)"""
+    extractor = BlockExtractor(select)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    
+    def drain():
+        blocks, extractor.blocks = extractor.blocks, []
+        for tag, markup in blocks:
+            yield tag, make_soup(markup, parser=parser).find(tag)
+    
+    for chunk in chunks:
+        extractor.feed(decoder.decode(chunk))
+        yield from drain()
+    extractor.feed(decoder.decode(b"", final=True))
+    extractor.close()
+    yield from drain()
+
+def _inside(ancestors, tag, css_class):
+    return any(name == tag and css_class in classes for name, classes in ancestors)
+
+def select_genshin_history_table(tag, classes, ancestors):
+    """往期祈愿: wikitable 内的 ys-qy-table 卡池表格"""
+    return tag == 'table' and 'ys-qy-table' in classes and _inside(ancestors, 'table', 'wikitable')
+
+def select_wikitable(tag, classes, ancestors):
+    return tag == 'table' and 'wikitable' in classes
+
+def select_hsr_block(tag, classes, ancestors):
+    """历史跃迁: 版本标题和 div.row 区块"""
+    return tag in ('h3', 'h4') or (tag == 'div' and 'row' in classes)
+
+def select_zzz_block(tag, classes, ancestors):
+    """往期调频: 版本标题和最外层的 wikitable"""
+    return tag == 'h3' or (tag == 'table' and 'wikitable' in classes and not _inside(ancestors, 'table', 'wikitable'))
+
+def iter_streamed_genshin(history_chunks, chronicled_chunks, current_year=None, parser=None):
+    """从两个页面的字节流逐个产出原神卡池，与 iter_genshin_history 结果一致"""
+    def tables():
+        for _, table in iter_page_blocks(history_chunks, select_genshin_history_table, parser):
+            yield table
+        for _, table in iter_page_blocks(chronicled_chunks, select_wikitable, parser):
+            # 与 find_all 一致，嵌套的 wikitable 也算作卡池表格
+            yield table
+            yield from table.find_all('table', class_='wikitable')
+    yield from iter_genshin_entries(tables(), current_year)
+
+def iter_streamed_hsr(chunks, parser=None):
+    """从历史跃迁页面的字节流逐个产出星穹铁道卡池，与 iter_hsr_wishes 结果一致"""
+    in_version = False
+    for tag, block in iter_page_blocks(chunks, select_hsr_block, parser):
+        if tag != 'div':
+            # 任何标题都结束上一个版本区块，带 mw-headline 的标题开始新的区块
+            in_version = block.find('span', class_='mw-headline') is not None
+        elif in_version:
+            yield from hsr_row_wishes(block)
+
+def iter_streamed_zzz(chunks, parser=None):
+    """从往期调频页面的字节流逐个产出绝区零卡池: (版本号, 上下半, 卡池)"""
+    heading_version = None
+    for tag, block in iter_page_blocks(chunks, select_zzz_block, parser):
+        if tag == 'h3':
+            heading_version = zzz_heading_version(block)
+        elif heading_version is not None:
+            for pool in zzz_table_pools(block):
+                yield heading_version[0], heading_version[1], pool
+
+# ==================== 完整历史导出 ====================
+
+# 导出完整历史需要的维基页面
+HISTORY_PAGE_PATHS = {
+    "genshin": (GENSHIN_HISTORY_PATH, GENSHIN_CHRONICLED_PATH),
+    "hsr": (HSR_HISTORY_PATH,),
+    "zzz": (ZZZ_HISTORY_PATH,),
+}
+
+HISTORY_EXPORT_INTERVAL = 600  # 同一游戏两次向维基确认页面是否更新的最短间隔（秒）
+
+# 每个游戏的页面确认锁（同一时间只有一个请求访问维基）和上次确认时间
+_export_locks = {game: threading.Lock() for game in HISTORY_PAGE_PATHS}
+_export_checked = {}
+
+def refresh_history_pages(game):
+    """确保磁盘页面缓存中有导出所需的页面
+    
+    每个游戏同一时间只有一个请求访问维基，其他请求等待其结果；距上次确认不足
+    HISTORY_EXPORT_INTERVAL 时直接使用磁盘缓存。页面以流的方式写入缓存（见
+    open_page_stream），不在内存中保留整个页面。访问维基失败但已有缓存时继续使用缓存，
+    没有缓存时抛出 requests.RequestException。
+    """
+    urls = [wiki_url(path) for path in HISTORY_PAGE_PATHS[game]]
+    with _export_locks[game]:
+        cached = all(_read_page_cache(url, with_content=False) for url in urls)
+        if cached and time.time() - _export_checked.get(game, 0) < HISTORY_EXPORT_INTERVAL:
+            return
+        try:
+            for url in urls:
+                with contextlib.closing(open_page_stream(url)) as stream:
+                    for _ in stream:
+                        pass
+        except requests.RequestException as e:
+            if not cached:
+                raise
+            print(f"确认 {game} 页面更新失败，使用磁盘缓存: {e}")
+        # 失败时同样等待一个间隔，维基出错期间不会被每个导出请求反复访问
+        _export_checked[game] = time.time()
+
+def open_history_streams(game):
+    """按页面顺序打开磁盘缓存中的页面字节流，每个文件在开始读取时才打开"""
+    return [_iter_page_file(_page_cache_paths(wiki_url(path))[0]) for path in HISTORY_PAGE_PATHS[game]]
+
+def _iter_page_file(path):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(PAGE_STREAM_CHUNK), b""):
+            yield chunk
+
+def iter_history_pools(game, streams, parser=None):
+    """边下载边解析，按页面顺序逐个产出全部卡池的统一记录，不受 MAX_VERSIONS 限制
+    
+    每个卡池表格（或版本区块）结束时即解析并产出，内存占用与页面大小无关。
+    """
+    try:
+        if game == "genshin":
+            for entry in iter_streamed_genshin(streams[0], streams[1], parser=parser):
+                yield unified_pool(game, entry)
+        elif game == "hsr":
+            for wish in iter_streamed_hsr(streams[0], parser):
+                yield unified_pool(game, format_hsr_wish_data([wish])[0])
+        else:
+            for version, phase, pool in iter_streamed_zzz(streams[0], parser):
+                yield unified_pool(game, pool, {"version": version, "phase": phase})
+    finally:
+        for stream in streams:
+            stream.close()
+
+def ndjson_lines(records):
+    """每条记录一行紧凑 JSON"""
+    for record in records:
+        yield serialize_json(record) + b"\n"
+
+# ==================== 历史数据库 ====================
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pools (
+    game TEXT NOT NULL,
+    name TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    type TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version TEXT NOT NULL,
+    start_ts REAL,
+    end_ts REAL,
+    record TEXT NOT NULL,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (game, name, start_time)
+);
+CREATE TABLE IF NOT EXISTS pool_items (
+    game TEXT NOT NULL,
+    name TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    item TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    rarity INTEGER NOT NULL,
+    PRIMARY KEY (game, name, start_time, item, item_key)
+);
+CREATE INDEX IF NOT EXISTS idx_pools_version ON pools (version);
+CREATE INDEX IF NOT EXISTS idx_pools_kind ON pools (kind);
+CREATE INDEX IF NOT EXISTS idx_pools_start_ts ON pools (start_ts);
+CREATE INDEX IF NOT EXISTS idx_pools_end_ts ON pools (end_ts);
+CREATE INDEX IF NOT EXISTS idx_pool_items_key ON pool_items (item_key);
+CREATE TABLE IF NOT EXISTS change_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    base INTEGER NOT NULL,
+    revision INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    revision INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    game TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_change_log_revision ON change_log (revision);
+CREATE TABLE IF NOT EXISTS pool_hashes (
+    game TEXT NOT NULL,
+    key TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (game, key)
+);
+"""
+HISTORY_MAX_LIMIT = 1000
+
+# 写入串行执行；读取每次使用独立连接（WAL 模式下读写互不阻塞）
+_history_db_lock = threading.Lock()
+_history_db_ready = set()
+
+def connect_history_db(path=None, readonly=False):
+    """打开历史数据库，首次打开时建表
+    
+    readonly 为 True 时以只读方式打开已有的数据库（不建表，文件不存在时抛出
+    sqlite3.OperationalError），用于多进程部署中只查询的工作进程。
+    """
+    path = path or HISTORY_DB_PATH
+    if readonly:
+        conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    if path not in _history_db_ready:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(HISTORY_SCHEMA)
+        _history_db_ready.add(path)
+    return conn
+
+def store_pool_history(game, data, path=None):
+    """把一个游戏当前的全部卡池写入历史数据库，已有卡池更新内容并保留首次出现时间"""
+    now = time.time()
+    pools = list(iter_game_pools(game, data))
+    epochs = pool_epochs(game, pools)
+    with _history_db_lock, contextlib.closing(connect_history_db(path)) as conn, conn:
+        for pool, (start_ts, end_ts, _) in zip(pools, epochs):
+            key = (game, pool["name"], pool["start_time"])
+            conn.execute(
+                """INSERT INTO pools (game, name, start_time, end_time, type, kind, version,
+                                      start_ts, end_ts, record, first_seen, last_seen)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (game, name, start_time) DO UPDATE SET
+                       end_time = excluded.end_time, type = excluded.type, kind = excluded.kind,
+                       version = excluded.version, start_ts = excluded.start_ts, end_ts = excluded.end_ts,
+                       record = excluded.record, last_seen = excluded.last_seen""",
+                key + (pool["end_time"], pool["type"], POOL_TYPE_ALIASES.get(pool["type"], pool["type"]),
+                       pool["version"], start_ts, end_ts,
+                       json.dumps(pool, ensure_ascii=False), now, now))
+            conn.execute("DELETE FROM pool_items WHERE game = ? AND name = ? AND start_time = ?", key)
+            conn.executemany(
+                "INSERT OR IGNORE INTO pool_items (game, name, start_time, item, item_key, rarity) VALUES (?, ?, ?, ?, ?, ?)",
+                [key + (item, item_key, rarity)
+                 for rarity, items in ((5, pool["five_stars"]), (4, pool["four_stars"]))
+                 for item in items for item_key in item_search_keys(item)])
+    return len(pools)
+
+@on_data_refresh
+def refresh_pool_history(game, data):
+    """数据刷新时写入历史数据库（HISTORY_DB_PATH 为空、只读或预热用的旧快照时不写入）"""
+    if HISTORY_DB_PATH and not HISTORY_DB_READONLY and not is_seeded_data(game, data):
+        store_pool_history(game, data)
+
+def query_pool_history(args, path=None):
+    """按查询参数在历史数据库中查找卡池，返回 (卡池记录列表, 匹配总数)
+    
+    支持 game、name、version、type、item（物品名称，与搜索接口相同的归一化规则）、
+    start/end（时间区间重叠）以及 limit/offset 分页。
+    """
+    where, params = [], []
+    games = [game for game in args.get('game', '').split(',') if game]
+    unknown_games = [game for game in games if game not in GAME_FETCHERS]
+    if unknown_games:
+        raise ValueError(f"未知游戏: {', '.join(unknown_games)}")
+    if games:
+        where.append(f"p.game IN ({', '.join('?' * len(games))})")
+        params += games
+    if args.get('name'):
+        where.append("p.name = ?")
+        params.append(args['name'])
+    if args.get('version'):
+        where.append("p.version = ?")
+        params.append(args['version'])
+    if args.get('type'):
+        where.append("p.kind = ?")
+        params.append(POOL_TYPE_ALIASES.get(args['type'], args['type']))
+    if args.get('item'):
+        where.append("EXISTS (SELECT 1 FROM pool_items i WHERE i.item_key = ? AND i.game = p.game"
+                     " AND i.name = p.name AND i.start_time = p.start_time)")
+        params.append(normalize_item_name(args['item']))
+    # 时间区间重叠判断，缺失的时间视为不限
+    if args.get('start'):
+        where.append("(p.end_ts IS NULL OR p.end_ts >= ?)")
+        params.append(parse_query_time(args['start']))
+    if args.get('end'):
+        where.append("(p.start_ts IS NULL OR p.start_ts <= ?)")
+        params.append(parse_query_time(args['end']))
+    
+    limit = min(max(int(args.get('limit', 100)), 0), HISTORY_MAX_LIMIT)
+    offset = max(int(args.get('offset', 0)), 0)
+    clause = f"WHERE {' AND '.join(where)}" if where else ""
+    with contextlib.closing(connect_history_db(path, readonly=HISTORY_DB_READONLY)) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM pools p {clause}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""SELECT p.record, p.start_ts, p.end_ts, p.first_seen, p.last_seen FROM pools p {clause}
+                ORDER BY p.start_ts IS NULL, p.start_ts DESC, p.game, p.name LIMIT ? OFFSET ?""",
+            params + [limit, offset]).fetchall()
+    
+    pools = []
+    for row in rows:
+        pool = json.loads(row["record"])
+        pool.update(start_ts=row["start_ts"], end_ts=row["end_ts"],
+                    first_seen=row["first_seen"], last_seen=row["last_seen"])
+        pools.append(pool)
+    return pools, total
+
+def load_history_pools(game, path=None):
+    """从历史数据库读取一个游戏出现过的全部卡池（带 start_ts/end_ts），按开始时间从近到远排列
+    
+    没有配置数据库或无法读取（例如只读打开时文件还不存在）时返回 None。
+    """
+    path = path or HISTORY_DB_PATH
+    if not path or (HISTORY_DB_READONLY and not os.path.exists(path)):
+        return None
+    try:
+        with contextlib.closing(connect_history_db(path, readonly=HISTORY_DB_READONLY)) as conn:
+            rows = conn.execute(
+                """SELECT record, start_ts, end_ts FROM pools WHERE game = ?
+                   ORDER BY start_ts IS NULL, start_ts DESC, name""", (game,)).fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"读取历史卡池出错: {e}")
+        return None
+    pools = []
+    for row in rows:
+        pool = json.loads(row["record"])
+        pool.update(start_ts=row["start_ts"], end_ts=row["end_ts"], start_estimated=False)
+        pools.append(pool)
+    return pools
+
+# 每个游戏用于统计和搜索的卡池: game -> {"source": 数据对象, "pools": [...], "coverage": 覆盖范围}
+_covered_pools = {}
+
+def covered_pools(game, data):
+    """统计和搜索使用的卡池：当前数据加上历史数据库中更早的卡池
+    
+    接口数据只保留最近 MAX_VERSIONS 个版本，有历史数据库时用其中出现过的全部卡池补全，
+    同一卡池以当前数据为准。coverage 说明覆盖范围，随统计和搜索结果一起返回：
+    {"source": "history_db"} 或 {"source": "current_data", "max_versions": MAX_VERSIONS}，
+    以及卡池数 pools。
+    """
+    entry = _covered_pools.get(game)
+    if entry is not None and entry["source"] is data and not coverage_outdated(entry["coverage"]):
+        return entry
+    time_entry = _time_pools.get(game)
+    pools = time_entry["pools"] if time_entry is not None and time_entry["source"] is data else \
+        build_time_pools(game, data)["pools"]
+    history = load_history_pools(game)
+    if history is None:
+        coverage = {"source": "current_data", "max_versions": MAX_VERSIONS}
+    else:
+        current_keys = {pool_key(pool) for pool in pools}
+        pools = pools + [pool for pool in history if pool_key(pool) not in current_keys]
+        coverage = {"source": "history_db"}
+    coverage["pools"] = len(pools)
+    entry = {"source": data, "pools": pools, "coverage": coverage}
+    _covered_pools[game] = entry
+    return entry
+
+def coverage_outdated(coverage):
+    """按当前数据计算时历史数据库还不存在（例如工作进程先于刷新进程启动），现在已经有了"""
+    return coverage["source"] == "current_data" and bool(HISTORY_DB_PATH) and os.path.exists(HISTORY_DB_PATH)
+
+_all_executor = ThreadPoolExecutor(max_workers=ALL_MAX_WORKERS, thread_name_prefix="gacha-all")
+
+def fetch_all_games_concurrently(deadline):
+    """并发获取所有游戏数据，超过截止时间的游戏返回错误而不阻塞其他游戏"""
+    futures = {game: _all_executor.submit(get_cached_data, game) for game in GAME_FETCHERS}
+    wait(futures.values(), timeout=deadline)
+    
+    results = {}
+    for game, future in futures.items():
+        if not future.done():
+            # 抓取仍在后台继续，完成后会写入缓存供下次使用
+            results[game] = {"error": f"获取数据超时（超过{deadline}秒）"}
+            continue
+        try:
+            results[game] = future.result()[0]
+        except Exception as e:
+            results[game] = {"error": f"获取数据失败: {str(e)}"}
+    return results
+
+# ==================== 定时刷新 ====================
+
+# 每个游戏的常规刷新间隔（秒）
+REFRESH_INTERVALS = {"genshin": 6 * 3600, "hsr": 6 * 3600, "zzz": 6 * 3600}
+# 版本更新日的刷新时间点 (weekday, hour)，UTC，与 update-gacha-data.yml 的 cron 一致
+REFRESH_SLOTS = [(4, 20), (4, 21), (5, 8)]
+REFRESH_RETRY_INTERVAL = 300  # 刷新失败后的重试间隔（秒）
+SCHEDULER_MAX_SLEEP = 60  # 调度线程最长休眠时间（秒）
+
+_scheduler_stop = threading.Event()
+_scheduler_thread = None
+
+def next_slot_after(timestamp):
+    """返回 timestamp 之后最近的一个定时刷新时间点"""
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    slots = []
+    for weekday, hour in REFRESH_SLOTS:
+        slot = (moment + timedelta(days=(weekday - moment.weekday()) % 7)).replace(
+            hour=hour, minute=0, second=0, microsecond=0)
+        if slot <= moment:
+            slot += timedelta(days=7)
+        slots.append(slot)
+    return min(slots).timestamp()
+
+def next_refresh_time(game):
+    """计算某个游戏下一次应当刷新的时间"""
+    with _cache_lock:
+        entry = dict(_cache.get(game) or {})
+    fetched_at = entry.get("fetched_at")
+    if fetched_at is None:
+        due = 0.0
+    else:
+        due = min(fetched_at + REFRESH_INTERVALS[game], next_slot_after(fetched_at))
+    last_attempt = entry.get("last_attempt")
+    if last_attempt and last_attempt != fetched_at:
+        # 上次刷新失败，稍后再试
+        due = max(due, last_attempt + REFRESH_RETRY_INTERVAL)
+    return due
+
+def warm_start_from_snapshots():
+    """启动时用磁盘上的快照填充缓存，缓存年龄按文件修改时间计算"""
+    for game in GAME_FETCHERS:
+        if seed_cache_from_snapshot(game):
+            print(f"已从快照预热 {game} 缓存")
+
+def run_scheduler(stop_event):
+    """调度循环：到期的游戏提交后台刷新，与按需刷新共用同一个抓取任务"""
+    while not stop_event.is_set():
+        now = time.time()
+        wake = now + SCHEDULER_MAX_SLEEP
+        for game in GAME_FETCHERS:
+            due = next_refresh_time(game)
+            if due <= now:
+                request_refresh(game)
+            else:
+                wake = min(wake, due)
+        stop_event.wait(max(1.0, wake - now))
+
+def start_scheduler():
+    """启动后台定时刷新线程（重复调用无效）"""
+    global _scheduler_thread
+    if _scheduler_thread is not None and _scheduler_thread.is_alive():
+        return _scheduler_thread
+    _scheduler_stop.clear()
+    _scheduler_thread = threading.Thread(target=run_scheduler, args=(_scheduler_stop,),
+                                         name="gacha-scheduler", daemon=True)
+    _scheduler_thread.start()
+    return _scheduler_thread
+
+def stop_scheduler():
+    """停止后台定时刷新线程"""
+    _scheduler_stop.set()
+
+# ==================== 快照更新 ====================
+
+SNAPSHOT_TIMESTAMP_KEYS = ("last_updated",)
+UPDATE_STATUS_LABELS = {"updated": "已更新", "unchanged": "内容未变化，跳过写入", "error": "刷新失败，保留原文件"}
+
+def snapshot_digest(data):
+    """快照内容摘要，不包含每次刷新都会变化的时间戳"""
+    if isinstance(data, dict):
+        data = {key: value for key, value in data.items() if key not in SNAPSHOT_TIMESTAMP_KEYS}
+    return hashlib.sha1(json.dumps(data, ensure_ascii=False, sort_keys=True).encode('utf-8')).hexdigest()
+
+def write_snapshot(game, data):
+    """原子写入快照文件（缩进 2，中文不转义）"""
+    path = os.path.join(SNAPSHOT_DIR, SNAPSHOT_FILES[game])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _atomic_write(path, json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8'))
+
+def update_snapshot(game, full=False):
+    """刷新一个游戏并写入快照，返回 "updated" / "unchanged" / "error"
+    
+    默认在上次快照的基础上增量解析，full 为 True 时完整解析页面。
+    """
+    previous = load_previous_snapshot(game)
+    try:
+        data = GAME_FETCHERS[game](previous=None if full else previous)
+    except Exception as e:
+        data = {"error": f"刷新数据失败: {str(e)}"}
+    if is_error_result(data):
+        print(f"刷新 {game} 数据出错: {data['error']}")
+        return "error"
+    if previous is not None and snapshot_digest(data) == snapshot_digest(previous):
+        return "unchanged"
+    write_snapshot(game, data)
+    return "updated"
+
+def update_snapshots(games, full=False):
+    """并行刷新多个游戏的快照，返回 {game: 状态}"""
+    with ThreadPoolExecutor(max_workers=len(games), thread_name_prefix="gacha-update") as executor:
+        return dict(zip(games, executor.map(lambda game: update_snapshot(game, full), games)))
+
+def update_command(argv):
+    """python app.py update：刷新快照文件，供定时工作流使用"""
+    global SNAPSHOT_DIR
+    parser = argparse.ArgumentParser(prog='app.py update', description='刷新并写入各游戏的快照文件')
+    parser.add_argument('--games', nargs='+', choices=list(GAME_FETCHERS), default=list(GAME_FETCHERS), help='要刷新的游戏')
+    parser.add_argument('--snapshot-dir', type=str, default=SNAPSHOT_DIR, help='快照文件所在目录')
+    parser.add_argument('--full', action='store_true', help='完整解析页面，不使用上次快照做增量解析')
+    args = parser.parse_args(argv)
+    SNAPSHOT_DIR = args.snapshot_dir
+    
+    start = time.perf_counter()
+    results = update_snapshots(args.games, args.full)
+    for game, status in results.items():
+        print(f"{game}: {UPDATE_STATUS_LABELS[status]}")
+    print(f"总耗时 {time.perf_counter() - start:.1f} 秒")
+    return 1 if "error" in results.values() else 0
+
+# ==================== API接口 ====================
+
+@route('/api/genshin', methods=['GET'])
+def get_genshin_data():
+    """API端点，返回原神卡池信息"""
+    return cached_game_response("genshin")
+
+@route('/api/hsr', methods=['GET'])
+def get_hsr_data():
+    """API端点，返回星穹铁道卡池信息"""
+    return cached_game_response("hsr")
+
+@route('/api/zzz', methods=['GET'])
+def get_zzz_data():
+    """API端点，返回绝区零卡池信息"""
+    return cached_game_response("zzz")
+
+@route('/api/all', methods=['GET'])
+def get_all_data():
+    """API端点，返回所有游戏的卡池信息"""
+    if SERVE_SNAPSHOTS:
+        return all_snapshots_response()
+    results = fetch_all_games_concurrently(ALL_DEADLINE)
+    if any(is_error_result(result) for result in results.values()):
+        return mark_stale(jsonify({
+            "last_updated": datetime.now().isoformat(),
+            "genshin": results["genshin"],
+            "hsr": results["hsr"],
+            "zzz": results["zzz"]
+        }), GAME_FETCHERS)
+    
+    return mark_stale(payload_response(get_all_payload(results)), GAME_FETCHERS)
+
+@route('/api/search', methods=['GET'])
+def search_data():
+    """API端点，按角色/武器名称前缀查找出现过的卡池"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "缺少查询参数 q"}), 400
+    games = [game for game in request.args.get('game', '').split(',') if game]
+    unknown_games = [game for game in games if game not in GAME_FETCHERS]
+    if unknown_games:
+        return jsonify({"error": f"未知游戏: {', '.join(unknown_games)}"}), 400
+    limit = request.args.get('limit', 50, type=int)
+    
+    ensure_search_index(games or list(GAME_FETCHERS))
+    results = search_items(query, games, limit)
+    return jsonify({
+        "query": query,
+        "count": len(results),
+        "results": results,
+        "coverage": search_coverage(games or list(GAME_FETCHERS))
+    })
+
+@route('/api/active', methods=['GET'])
+def active_pools():
+    """API端点，返回指定时刻（默认当前）进行中和即将开始的卡池"""
+    games = [game for game in request.args.get('game', '').split(',') if game]
+    unknown_games = [game for game in games if game not in GAME_FETCHERS]
+    if unknown_games:
+        return jsonify({"error": f"未知游戏: {', '.join(unknown_games)}"}), 400
+    try:
+        at = parse_query_time(request.args['at']) if request.args.get('at') else time.time()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    upcoming_limit = request.args.get('upcoming_limit', ACTIVE_UPCOMING_LIMIT, type=int)
+    
+    ensure_time_index(games or list(GAME_FETCHERS))
+    active, upcoming = find_active_pools(at, games, upcoming_limit)
+    return jsonify({
+        "at": at,
+        "active": active,
+        "upcoming": upcoming
+    })
+
+@route('/api/stats', methods=['GET'])
+def stats_data():
+    """API端点，返回五星物品的 UP 记录、距上次 UP 的天数、平均复刻间隔和同期四星"""
+    games = [game for game in request.args.get('game', '').split(',') if game]
+    unknown_games = [game for game in games if game not in GAME_FETCHERS]
+    if unknown_games:
+        return jsonify({"error": f"未知游戏: {', '.join(unknown_games)}"}), 400
+    games = games or list(GAME_FETCHERS)
+    
+    ensure_stats(games)
+    if request.args.get('item'):
+        return jsonify({"item": request.args['item'], "results": find_item_stats(request.args['item'], games),
+                        "coverage": stats_coverage(games)})
+    payload = get_stats_payload(games)
+    if payload is None:
+        return jsonify({"error": "暂无数据"}), 503
+    return payload_response(payload)
+
+@route('/api/changes', methods=['GET'])
+def changes_data():
+    """API端点，返回指定版本号（since）或时间（since_time）之后新增、修改和删除的卡池"""
+    games = [game for game in request.args.get('game', '').split(',') if game]
+    unknown_games = [game for game in games if game not in GAME_FETCHERS]
+    if unknown_games:
+        return jsonify({"error": f"未知游戏: {', '.join(unknown_games)}"}), 400
+    revision = request.args.get('since', type=int)
+    try:
+        timestamp = parse_query_time(request.args['since_time']) if request.args.get('since_time') else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    ensure_change_feed(games or list(GAME_FETCHERS))
+    current, reset, changes = changes_since(revision, timestamp, games)
+    response = jsonify({
+        "revision": current,
+        "reset": reset,
+        "changes": changes
+    })
+    response.headers['X-Revision'] = str(current)
+    return response
+
+@route('/api/events', methods=['GET'])
+def events():
+    """API端点，以 Server-Sent Events 推送卡池变更，支持 Last-Event-ID 补发"""
+    games = [game for game in request.args.get('game', '').split(',') if game]
+    unknown_games = [game for game in games if game not in GAME_FETCHERS]
+    if unknown_games:
+        return jsonify({"error": f"未知游戏: {', '.join(unknown_games)}"}), 400
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('since')
+    if last_event_id is not None and not last_event_id.isdigit():
+        return jsonify({"error": f"无效的 Last-Event-ID: {last_event_id}"}), 400
+    
+    ensure_change_feed(games or list(GAME_FETCHERS))
+    subscriber = subscribe(set(games) or None)
+    if subscriber is None:
+        return jsonify({"error": "订阅者过多，请稍后重试"}), 503
+    stream = event_stream(subscriber, int(last_event_id) if last_event_id is not None else None)
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # 客户端在第一条消息前断开时生成器不会执行，需在这里注销
+    response.call_on_close(lambda: unsubscribe(subscriber))
+    return response
+
+@route('/api/<game>/history.ndjson', methods=['GET'])
+def history_ndjson(game):
+    """API端点，逐行流式返回维基上的全部卡池（NDJSON，每行一个卡池）
+    
+    从磁盘页面缓存解析，访问维基的频率受 HISTORY_EXPORT_INTERVAL 限制（见 refresh_history_pages）。
+    """
+    if game not in GAME_FETCHERS:
+        return jsonify({"error": f"未知游戏: {game}"}), 404
+    if not PAGE_CACHE_DIR:
+        return jsonify({"error": "页面缓存未启用，无法导出完整历史"}), 503
+    try:
+        refresh_history_pages(game)
+        streams = open_history_streams(game)
+    except requests.RequestException as e:
+        return jsonify({"error": f"网络请求失败: {str(e)}"}), 502
+    return Response(ndjson_lines(iter_history_pools(game, streams)), mimetype='application/x-ndjson')
+
+@route('/api/history', methods=['GET'])
+def history_data():
+    """API端点，查询历史数据库中的全部卡池（不受 MAX_VERSIONS 限制）"""
+    if not HISTORY_DB_PATH:
+        return jsonify({"error": "历史数据库未启用"}), 404
+    try:
+        pools, total = query_pool_history(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except sqlite3.OperationalError as e:
+        # 只读模式下主进程还没有写入过数据库
+        return jsonify({"error": f"历史数据库不可用: {e}"}), 503
+    return jsonify({
+        "total": total,
+        "count": len(pools),
+        "pools": pools
+    })
+
+@route('/health', methods=['GET'])
+def health_check():
+    """健康检查接口，附带上游熔断状态和刷新失败的游戏"""
+    return jsonify({
+        "status": "healthy",
+        "timestamp": datetime.now().isoformat(),
+        "upstream": circuit_states(),
+        "stale": [game for game in GAME_FETCHERS if refresh_failed_at(game) is not None],
+    })
+
+@route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 指标接口"""
+    now = time.time()
+    gauges = {}
+    for game in GAME_FETCHERS:
+        if SERVE_SNAPSHOTS:
+            snapshot = _snapshots.get(game)
+            fetched_at = snapshot["mtime"] if snapshot else None
+        else:
+            with _cache_lock:
+                fetched_at = _cache.get(game, {}).get("fetched_at")
+        if fetched_at is not None:
+            gauges[_metric_key("gacha_data_age_seconds", {"game": game})] = now - fetched_at
+    circuit_values = {"closed": 0, "open": 1, "half_open": 2}
+    for host, state in circuit_states().items():
+        gauges[_metric_key("gacha_circuit_state", {"host": host})] = circuit_values[state]
+    return Response(render_metrics(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['update']:
+        raise SystemExit(update_command(sys.argv[2:]))
+    if sys.argv[1:2] == ['serve']:
+        del sys.argv[1]
+    
+    parser = argparse.ArgumentParser(description='卡池追踪器合并项目')
     parser.add_argument('--host', type=str, default='0.0.0.0', help='服务器主机地址')
     parser.add_argument('--port', type=int, default=5000, help='服务器端口')
     parser.add_argument('--debug', action='store_true', help='启用调试模式')
+    parser.add_argument('--max-versions', type=int, default=MAX_VERSIONS, help='接口返回的最近版本数（0 表示不限制）')
+    parser.add_argument('--cache-ttl', type=int, default=CACHE_TTL, help='缓存有效期（秒）')
+    parser.add_argument('--all-deadline', type=float, default=ALL_DEADLINE, help='/api/all 中每个游戏的最长等待时间（秒）')
+    parser.add_argument('--serve-snapshots', action='store_true', help='直接返回已提交的快照文件，不访问网络')
+    parser.add_argument('--snapshot-dir', type=str, default=SNAPSHOT_DIR, help='快照文件所在目录')
+    parser.add_argument('--no-scheduler', action='store_true', help='不启动后台定时刷新，只在请求时刷新')
+    parser.add_argument('--history-db', type=str, default=HISTORY_DB_PATH, help='历史卡池数据库路径（空字符串表示不启用）')
+    parser.add_argument('--profile-refresh', choices=list(GAME_FETCHERS), help='在 cProfile 下刷新一次指定游戏的数据后退出')
+    parser.add_argument('--profile-output', type=str, help='性能分析结果文件（可用 snakeviz 等工具查看）')
     args = parser.parse_args()
+    MAX_VERSIONS = args.max_versions or None
+    CACHE_TTL = args.cache_ttl
+    ALL_DEADLINE = args.all_deadline
+    SERVE_SNAPSHOTS = args.serve_snapshots
+    SNAPSHOT_DIR = args.snapshot_dir
+    HISTORY_DB_PATH = args.history_db
+    
+    if args.profile_refresh:
+        result = profile_refresh(args.profile_refresh, args.profile_output)
+        raise SystemExit(1 if is_error_result(result) else 0)
+    
+    if SERVE_SNAPSHOTS:
+        print(f"快照模式: 从 {SNAPSHOT_DIR} 加载数据")
+        load_all_snapshots()
+        start_snapshot_watcher()
+    else:
+        warm_start_from_snapshots()
+        # 调试模式下只在重载后的子进程中启动，避免重复抓取
+        if not args.no_scheduler and (not args.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+            print("后台定时刷新已启动")
+            start_scheduler()
     
     print(f"启动卡池追踪器服务器: http://{args.host}:{args.port}")
     print(f"API接口:")
@@ -683,6 +3739,15 @@ if __name__ == '__main__':
     print(f"  - 星穹铁道: http://{args.host}:{args.port}/api/hsr")
     print(f"  - 绝区零: http://{args.host}:{args.port}/api/zzz")
     print(f"  - 所有游戏: http://{args.host}:{args.port}/api/all")
+    print(f"  - 搜索: http://{args.host}:{args.port}/api/search?q=名称")
+    print(f"  - 历史卡池: http://{args.host}:{args.port}/api/history?item=名称")
+    print(f"  - 当前卡池: http://{args.host}:{args.port}/api/active")
+    print(f"  - 复刻统计: http://{args.host}:{args.port}/api/stats?item=名称")
+    print(f"  - 变更记录: http://{args.host}:{args.port}/api/changes?since=版本号")
+    print(f"  - 变更推送: http://{args.host}:{args.port}/api/events")
+    print(f"  - 完整历史: http://{args.host}:{args.port}/api/<游戏>/history.ndjson")
     print(f"  - 健康检查: http://{args.host}:{args.port}/health")
+    print(f"  - 运行指标: http://{args.host}:{args.port}/metrics")
     
+    app = create_app()
     app.run(host=args.host, port=args.port, debug=args.debug)
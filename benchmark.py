@@ -0,0 +1,248 @@
+"""离线解析基准测试
+
+使用 fixtures/ 下的样本页面测量三个游戏的解析耗时、内存分配和峰值 RSS，
+不访问网络。每个游戏在独立子进程中运行，保证峰值 RSS 互不影响。
+
+样本页面是根据快照生成的合成页面（见 fixtures/make_fixtures.py），在它们上的 --check
+只能发现解析器的回归，不能证明解析器与真实维基页面相符。fixtures/recorded/ 有录制的
+真实页面时，--check 还会对比录制时的解析结果，--compare-parsers 也会对比这些页面。
+
+    python benchmark.py                       # 测量全部游戏
+    python benchmark.py --games genshin -n 20 # 指定游戏和重复次数
+    python benchmark.py --check               # 对比已提交的快照并检查复刻统计，不一致时返回非零
+    python benchmark.py --compare-parsers     # 检查 lxml 与 html.parser 结果一致
+    python benchmark.py --games genshin --parse-workers 4  # 原神往期表格用 4 个进程并行解析
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import app
+from fixtures.make_fixtures import (load_fixture, load_recorded, load_recorded_expected, load_snapshot_json,
+                                    snapshot_year)
+
+GAMES = ["genshin", "hsr", "zzz"]
+
+
+def load_pages(game):
+    """读取某个游戏用到的样本页面"""
+    if game == "genshin":
+        return [load_fixture(app.GENSHIN_HISTORY_PATH), load_fixture(app.GENSHIN_CHRONICLED_PATH)]
+    if game == "hsr":
+        return [load_fixture(app.HSR_HISTORY_PATH)]
+    return [load_fixture(app.ZZZ_HISTORY_PATH)]
+
+
+def parse_pages(game, pages, parser=None, year=None):
+    """不经过网络直接解析页面，返回与接口相同的数据结构"""
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        if game == "genshin":
+            return app.parse_genshin_pages(pages[0], pages[1], current_year=year, parser=parser)
+        if game == "hsr":
+            return {"wish_data": app.format_hsr_wish_data(app.parse_hsr_page(pages[0], parser=parser))}
+        return app.parse_zzz_page(pages[0], parser=parser)
+
+
+def load_recorded_pages(game):
+    """读取某个游戏录制的真实页面，缺少任一页面时返回 None"""
+    paths = [app.GENSHIN_HISTORY_PATH, app.GENSHIN_CHRONICLED_PATH] if game == "genshin" else \
+        [app.HSR_HISTORY_PATH if game == "hsr" else app.ZZZ_HISTORY_PATH]
+    pages = [load_recorded(path) for path in paths]
+    return None if any(page is None for page in pages) else pages
+
+
+def golden_view(game, data):
+    """去掉每次运行都会变化的字段"""
+    if game == "genshin":
+        return {key: data.get(key) for key in ("total_pools", "latest_versions", "gacha_data")}
+    if game == "hsr":
+        return {"wish_data": data.get("wish_data")}
+    return data
+
+
+def check_golden(game, parser=None):
+    """解析结果与已提交快照对比，返回不一致的描述列表"""
+    snapshot = load_snapshot_json(game)
+    year = snapshot_year(snapshot) if game == "genshin" else None
+    expected = golden_view(game, snapshot)
+    actual = golden_view(game, parse_pages(game, load_pages(game), parser, year))
+    if actual == expected:
+        return []
+    return [f"{game}: 解析结果与 {app.SNAPSHOT_FILES[game]} 不一致\n"
+            f"  期望: {json.dumps(expected, ensure_ascii=False)[:300]}\n"
+            f"  实际: {json.dumps(actual, ensure_ascii=False)[:300]}"]
+
+
+def check_recorded(game, parser=None):
+    """录制的真实页面的解析结果与录制时一致，返回不一致的描述列表；没有录制时返回 None"""
+    pages = load_recorded_pages(game)
+    expected = load_recorded_expected()
+    if pages is None or expected is None or game not in expected["games"]:
+        return None
+    actual = golden_view(game, parse_pages(game, pages, parser, expected["year"]))
+    if actual == expected["games"][game]:
+        return []
+    return [f"{game}: 录制页面的解析结果与 {expected['recorded_at']} 录制时不一致\n"
+            f"  期望: {json.dumps(expected['games'][game], ensure_ascii=False)[:300]}\n"
+            f"  实际: {json.dumps(actual, ensure_ascii=False)[:300]}"]
+
+
+def check_parallel(parser=None):
+    """原神往期祈愿页面并行解析与串行解析结果一致（样本页面较小，固定用两个进程）"""
+    content = load_fixture(app.GENSHIN_HISTORY_PATH)
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        soup = app.make_soup(content, app.WIKITABLE_STRAINER, parser)
+        serial = [app.parse_genshin_gacha_table(table) for table in app.find_genshin_history_tables(soup)]
+        parallel = app.parse_genshin_history_parallel(content, 2, parser)
+    if parallel == serial:
+        return []
+    return [f"genshin: 往期祈愿页面并行解析得到 {len(parallel)} 个结果，与串行解析的 {len(serial)} 个不一致"]
+
+
+def check_stats(game):
+    """复刻统计与快照一致：UP 记录按版本排列，最近一次 UP 属于最新的版本"""
+    snapshot = load_snapshot_json(game)
+    items = app.build_item_stats(game, app.build_time_pools(game, snapshot)["pools"])
+    problems = []
+    for item in items.values():
+        versions = [app.version_order_key(run["version"]) or (0, 0) for run in item["runs"]]
+        last_runs = [run for run in item["runs"] if run["start_time"] == item["last_run"]]
+        if versions != sorted(versions):
+            problems.append(f"{game}: {item['name']} 的 UP 记录没有按版本排列")
+        elif not last_runs or (app.version_order_key(last_runs[-1]["version"]) or (0, 0)) != versions[-1]:
+            problems.append(f"{game}: {item['name']} 的最近一次 UP 为 {item['last_run']}，"
+                            f"不在最新版本 {item['runs'][-1]['version']}")
+    return problems
+
+
+def measure(game, repeat, parser=None):
+    """在当前进程内测量单个游戏，返回结果字典"""
+    pages = load_pages(game)
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_pages(game, pages, parser)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    result = parse_pages(game, pages, parser)
+    retained, peak = tracemalloc.get_traced_memory()
+    alloc_blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del result
+
+    return {
+        "game": game,
+        "parser": "lxml" if (parser or app.HTML_PARSER) != "html.parser" and app.HAS_LXML else "html.parser",
+        "page_bytes": sum(len(p) for p in pages),
+        "runs": repeat,
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "alloc_peak_kib": peak / 1024,
+        "retained_kib": retained / 1024,
+        "retained_blocks": alloc_blocks,
+        "rss_base_kib": rss_before,
+        "rss_peak_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run_in_subprocess(game, repeat, parser, parse_workers=None):
+    """在独立子进程中测量，避免峰值 RSS 互相影响"""
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", game, "-n", str(repeat)]
+    if parser:
+        cmd += ["--parser", parser]
+    if parse_workers is not None:
+        cmd += ["--parse-workers", str(parse_workers)]
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_table(results):
+    columns = [("game", "游戏", "{}"), ("parser", "解析器", "{}"),
+               ("page_bytes", "页面字节", "{:,}"),
+               ("min_ms", "最短ms", "{:.1f}"), ("median_ms", "中位ms", "{:.1f}"),
+               ("alloc_peak_kib", "分配峰值KiB", "{:,.0f}"), ("retained_kib", "返回时KiB", "{:,.0f}"),
+               ("retained_blocks", "返回时块数", "{:,}"),
+               ("rss_peak_kib", "峰值RSS KiB", "{:,}")]
+    rows = [[fmt.format(r[key]) for key, _, fmt in columns] for r in results]
+    widths = [max(len(title), *(len(row[i]) for row in rows)) for i, (_, title, _) in enumerate(columns)]
+    print("  ".join(title.ljust(w) for (_, title, _), w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(cell.ljust(w) for cell, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线解析基准测试')
+    parser.add_argument('--games', nargs='+', choices=GAMES, default=GAMES, help='要测量的游戏')
+    parser.add_argument('-n', '--repeat', type=int, default=5, help='每个游戏重复解析次数')
+    parser.add_argument('--parser', choices=['auto', 'lxml', 'html.parser'], help='HTML 解析器')
+    parser.add_argument('--check', action='store_true', help='只对比解析结果与已提交快照')
+    parser.add_argument('--compare-parsers', action='store_true', help='检查 lxml 与 html.parser 结果一致')
+    parser.add_argument('--parse-workers', type=int,
+                        help='原神往期表格的并行解析进程数（忽略页面大小门槛，1 表示串行）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出测量结果')
+    parser.add_argument('--child', choices=GAMES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.parse_workers is not None:
+        app.PARSE_WORKERS = args.parse_workers
+        app.PARSE_PARALLEL_MIN_BYTES = 0
+    if args.child:
+        print(json.dumps(measure(args.child, args.repeat, args.parser)))
+        return 0
+
+    if args.check or args.compare_parsers:
+        problems = []
+        recorded = []
+        for game in args.games:
+            if args.check:
+                problems += check_golden(game, args.parser)
+                problems += check_stats(game)
+                if game == "genshin":
+                    problems += check_parallel(args.parser)
+                recorded_problems = check_recorded(game, args.parser)
+                if recorded_problems is None:
+                    print(f"{game}: 没有录制的真实页面（python fixtures/make_fixtures.py --record），只检查了合成样本")
+                else:
+                    problems += recorded_problems
+                    recorded.append(game)
+            if args.compare_parsers:
+                if not app.HAS_LXML:
+                    print("未安装 lxml，跳过解析器对比")
+                    break
+                for label, pages in (("合成样本", load_pages(game)), ("录制页面", load_recorded_pages(game))):
+                    if pages is None:
+                        print(f"{game}: 没有录制的真实页面，只对比了合成样本")
+                        continue
+                    lxml_result = golden_view(game, parse_pages(game, pages, "lxml", 2000))
+                    if lxml_result != golden_view(game, parse_pages(game, pages, "html.parser", 2000)):
+                        problems.append(f"{game}: {label}上 lxml 与 html.parser 解析结果不一致")
+        for problem in problems:
+            print(problem)
+        if not problems:
+            print(f"全部一致（合成样本）: {', '.join(args.games)}")
+            if recorded:
+                print(f"全部一致（录制页面）: {', '.join(recorded)}")
+        return 1 if problems else 0
+
+    results = [run_in_subprocess(game, args.repeat, args.parser, args.parse_workers) for game in args.games]
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_table(results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
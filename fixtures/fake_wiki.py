@@ -0,0 +1,180 @@
+"""本地模拟维基服务器
+
+用 fixtures/ 下的合成样本页面代替 wiki.biligame.com，支持延迟和错误注入，
+配合 GACHA_WIKI_BASE_URL 在不访问真实维基的情况下运行和压测服务。
+
+    python fixtures/fake_wiki.py --port 8600
+    python fixtures/fake_wiki.py --latency 0.5 --jitter 0.2 --error-rate 0.1
+    GACHA_WIKI_BASE_URL=http://127.0.0.1:8600 python app.py
+
+运行中可通过 /__fault 调整注入参数，例如模拟维基宕机后恢复：
+
+    curl 'http://127.0.0.1:8600/__fault?error_rate=1'
+    curl 'http://127.0.0.1:8600/__fault?error_rate=0'
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, quote, unquote, urlsplit
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(FIXTURE_DIR))
+
+from fixtures.make_fixtures import FIXTURE_FILES, load_fixture  # noqa: E402
+
+# 可在运行中通过 /__fault 修改的注入参数
+FAULT_FIELDS = {
+    "latency": float,  # 每次响应前的固定延迟（秒）
+    "jitter": float,  # 额外的随机延迟上限（秒）
+    "error_rate": float,  # 返回 error_status 的概率
+    "error_status": int,
+    "drop_rate": float,  # 不返回任何内容直接断开连接的概率
+    "chunk_delay": float,  # 正文每 16 KiB 之间的延迟（秒），模拟慢速下载
+}
+
+
+def canonical_path(path):
+    """统一百分号编码，使编码和未编码的路径都能匹配"""
+    return quote(unquote(path), safe='/')
+
+
+class FakeWiki:
+    """样本页面和注入参数"""
+
+    def __init__(self, etag=True, **faults):
+        self.pages = {}
+        for wiki_path in FIXTURE_FILES:
+            body = load_fixture(wiki_path)
+            self.pages[canonical_path(wiki_path)] = {
+                "body": body,
+                "etag": f'"{hashlib.sha1(body).hexdigest()}"' if etag else None,
+                "last_modified": formatdate(time.time(), usegmt=True),
+            }
+        self.faults = {name: cast(faults.get(name) or 0) for name, cast in FAULT_FIELDS.items()}
+        self.faults["error_status"] = self.faults["error_status"] or 503
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, status):
+        with self.lock:
+            self.counts[status] = self.counts.get(status, 0) + 1
+
+    def update_faults(self, params):
+        """根据查询参数更新注入参数，返回当前配置"""
+        with self.lock:
+            for name, value in params.items():
+                if name in FAULT_FIELDS:
+                    self.faults[name] = FAULT_FIELDS[name](value)
+            return dict(self.faults, requests=dict(self.counts))
+
+
+class FakeWikiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    wiki = None
+    verbose = False
+
+    def log_message(self, format, *args):
+        if self.verbose:
+            super().log_message(format, *args)
+
+    def send_body(self, status, body, content_type="text/html; charset=utf-8", headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            if value:
+                self.send_header(name, value)
+        self.end_headers()
+        chunk_delay = self.wiki.faults["chunk_delay"]
+        if not chunk_delay:
+            self.wfile.write(body)
+            return
+        for offset in range(0, len(body), 16384):
+            self.wfile.write(body[offset:offset + 16384])
+            self.wfile.flush()
+            time.sleep(chunk_delay)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == "/__fault":
+            config = self.wiki.update_faults(dict(parse_qsl(url.query)))
+            self.send_body(200, json.dumps(config).encode(), "application/json")
+            return
+
+        faults = self.wiki.faults
+        delay = faults["latency"] + random.uniform(0, faults["jitter"])
+        if delay:
+            time.sleep(delay)
+        if random.random() < faults["drop_rate"]:
+            self.wiki.count("drop")
+            self.close_connection = True
+            return
+        if random.random() < faults["error_rate"]:
+            self.wiki.count(faults["error_status"])
+            self.send_body(faults["error_status"], b"injected error", "text/plain")
+            return
+
+        page = self.wiki.pages.get(canonical_path(url.path))
+        if page is None:
+            self.wiki.count(404)
+            self.send_body(404, b"not found", "text/plain")
+            return
+        if page["etag"] and self.headers.get("If-None-Match") == page["etag"]:
+            self.wiki.count(304)
+            self.send_response(304)
+            self.send_header("ETag", page["etag"])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.wiki.count(200)
+        self.send_body(200, page["body"], headers=[("ETag", page["etag"]),
+                                                   ("Last-Modified", page["last_modified"])])
+
+
+def make_server(host="127.0.0.1", port=8600, verbose=False, **options):
+    """创建模拟维基服务器（未启动），options 为 FakeWiki 的参数"""
+    handler = type("Handler", (FakeWikiHandler,), {"wiki": FakeWiki(**options), "verbose": verbose})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地模拟维基服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8600, help='监听端口')
+    parser.add_argument('--latency', type=float, default=0, help='每次响应前的固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0, help='额外的随机延迟上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回错误状态码的概率')
+    parser.add_argument('--error-status', type=int, default=503, help='注入的错误状态码')
+    parser.add_argument('--drop-rate', type=float, default=0, help='直接断开连接的概率')
+    parser.add_argument('--chunk-delay', type=float, default=0, help='正文每 16 KiB 之间的延迟（秒）')
+    parser.add_argument('--no-etag', action='store_true', help='不返回 ETag，每次都返回完整页面')
+    parser.add_argument('-v', '--verbose', action='store_true', help='打印每个请求')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.verbose, etag=not args.no_etag,
+                         latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                         error_status=args.error_status, drop_rate=args.drop_rate,
+                         chunk_delay=args.chunk_delay)
+    print(f"模拟维基已启动: http://{args.host}:{server.server_address[1]}", flush=True)
+    for wiki_path, filename in FIXTURE_FILES.items():
+        print(f"  - {unquote(wiki_path)} -> {filename}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,359 @@
+"""生成离线解析用的维基页面样本
+
+fixtures/*.html 是合成样本：根据已提交的 gacha_data.json 快照，按解析器预期的
+页面结构生成 HTML，快照中被 MAX_VERSIONS 截掉的历史部分用编号卡池补齐，使页面
+规模接近真实页面。它们不是维基上的真实页面，benchmark.py --check 把它们解析回
+同一份快照，只能发现解析器改动前后的行为变化（回归），不能证明解析器与真实
+维基页面的标记相符，也不能证明不同解析器在真实页面上结果一致。
+
+--record 把真实页面原样（gzip 压缩，不裁剪标记）录制到 fixtures/recorded/，不覆盖合成
+样本，同时把当前解析器在这些页面上的结果写入 recorded/expected.json。之后
+benchmark.py --check 会在录制的页面上对比这份结果，--compare-parsers 会在录制的页面上
+额外对比 lxml 与 html.parser。录制需要能访问维基，维基改版后重新录制并检查结果的差异。
+
+    python fixtures/make_fixtures.py            # 根据快照生成合成样本
+    python fixtures/make_fixtures.py --record   # 从维基录制真实页面
+"""
+import argparse
+import gzip
+import html
+import json
+import os
+import re
+import sys
+from datetime import datetime
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(FIXTURE_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import app  # noqa: E402
+
+RECORDED_DIR = os.path.join(FIXTURE_DIR, "recorded")
+RECORDED_EXPECTED = os.path.join(RECORDED_DIR, "expected.json")
+
+# 维基页面路径 -> 样本文件名（合成样本和录制的真实页面使用相同的文件名）
+FIXTURE_FILES = {
+    app.GENSHIN_HISTORY_PATH: "ys_wish_history.html",
+    app.GENSHIN_CHRONICLED_PATH: "ys_chronicled_wish.html",
+    app.HSR_HISTORY_PATH: "sr_warp_history.html",
+    app.ZZZ_HISTORY_PATH: "zzz_signal_history.html",
+}
+
+GENSHIN_TOTAL_POOLS = 269  # 往期祈愿页面的卡池总数
+HSR_FILLER_VERSIONS = ["3.2", "3.1", "3.0", "2.7", "2.6", "2.5", "2.4", "2.3", "2.2", "2.1", "2.0",
+                       "1.6", "1.5", "1.4", "1.3", "1.2", "1.1", "1.0"]
+ZZZ_FILLER_VERSIONS = ["2.1", "2.0", "1.7", "1.6", "1.5", "1.4", "1.3", "1.2", "1.1", "1.0"]
+
+
+def fixture_path(wiki_path):
+    """样本文件的完整路径"""
+    return os.path.join(FIXTURE_DIR, FIXTURE_FILES[wiki_path])
+
+
+def load_fixture(wiki_path):
+    """读取样本页面字节"""
+    with open(fixture_path(wiki_path), 'rb') as f:
+        return f.read()
+
+
+def recorded_path(wiki_path):
+    """录制的真实页面（gzip 压缩）的完整路径"""
+    return os.path.join(RECORDED_DIR, FIXTURE_FILES[wiki_path] + ".gz")
+
+
+def load_recorded(wiki_path):
+    """读取录制的真实页面字节，没有录制时返回 None"""
+    try:
+        with gzip.open(recorded_path(wiki_path), 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def load_recorded_expected():
+    """读取录制时的解析结果 {"recorded_at", "year", "games": {游戏: 结果}}，没有录制时返回 None"""
+    try:
+        with open(RECORDED_EXPECTED, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def load_snapshot_json(game):
+    """读取已提交的快照"""
+    with open(os.path.join(ROOT_DIR, app.SNAPSHOT_FILES[game]), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def snapshot_year(snapshot):
+    """快照生成时的年份，用于还原原神日期的年份补全"""
+    return int(snapshot["last_updated"][:4])
+
+
+def esc(text):
+    return html.escape(text, quote=True)
+
+
+def page_shell(title, body):
+    """包一层与维基相同的页面框架（导航、侧栏等解析时应被忽略的内容）"""
+    nav = "\n".join(f'<li><a href="/wiki/nav{i}" title="导航{i}">导航链接{i}</a></li>' for i in range(300))
+    return f"""<!DOCTYPE html>
+<html lang="zh-Hans-CN">
+<head>
+<meta charset="UTF-8">
+<title>{esc(title)} - BWIKI</title>
+<link rel="stylesheet" href="/load.php?modules=site.styles">
+<script>var wgPageName = {json.dumps(title, ensure_ascii=False)};</script>
+</head>
+<body class="mediawiki">
+<div id="mw-navigation"><h3 id="p-navigation-label">导航</h3><ul>
+{nav}
+</ul></div>
+<div id="content" class="mw-body">
+<h1 id="firstHeading" class="firstHeading">{esc(title)}</h1>
+<div id="bodyContent" class="mw-body-content"><div id="mw-content-text" class="mw-content-ltr">
+<div class="mw-parser-output">
+{body}
+</div></div></div></div>
+<div id="footer"><h3>页脚</h3><p>本站内容来自玩家贡献</p></div>
+</body>
+</html>
+"""
+
+
+# ==================== 原神 ====================
+
+def _genshin_raw_time(value, year):
+    """去掉解析时补全的年份（补全时会把原文中的 / 替换为 -）"""
+    prefix = f"{year}/"
+    rest = value[len(prefix):]
+    if value.startswith(prefix) and '/' not in rest and not re.search(r'\d{4}', rest):
+        return value[len(prefix):]
+    return value
+
+
+def render_genshin_table(entry, year, css_class):
+    is_weapon = entry["type"] == "武器池"
+    five_header = "5星武器" if is_weapon else "5星角色"
+    four_header = "4星武器" if is_weapon else "4星角色"
+    start = _genshin_raw_time(entry["start_time"], year)
+    end = _genshin_raw_time(entry["end_time"], year)
+    five = "".join(f'<a href="/ys/{esc(s)}" title="{esc(s)}">{esc(s)}</a><br>' for s in entry["five_stars"])
+    four = "".join(f'<a href="/ys/{esc(s)}" title="{esc(s)}">{esc(s)}</a><br>' for s in entry["four_stars"])
+    return f"""<table class="{css_class}" style="width:100%">
+<tr><th colspan="2"><img alt="{esc(entry['name'])}" src="/images/ys/pool.png" width="320"></th></tr>
+<tr><th>时间</th><td>{esc(start)} ~ {esc(end)}</td></tr>
+<tr><th>版本</th><td>{esc(entry['version'])}</td></tr>
+<tr><th>{five_header}</th><td>{five}</td></tr>
+<tr><th>{four_header}</th><td>{four}</td></tr>
+</table>"""
+
+
+def genshin_filler_entries(count):
+    """生成被 MAX_VERSIONS 截掉的旧版本卡池"""
+    versions = [f"{major}.{minor}" for major, last in ((5, 8), (4, 8), (3, 8), (2, 8), (1, 6))
+                for minor in range(last, -1, -1)]
+    entries = []
+    for i in range(count):
+        version = versions[i * len(versions) // count]
+        issue = 73 - i // 3
+        kind = i % 3
+        entries.append({
+            "name": f"「历史样本{i:03d}」{issue:03d}期{'武器' if kind == 2 else '角色'}活动祈愿",
+            "type": "武器池" if kind == 2 else "角色池",
+            "version": version,
+            "start_time": f"20{20 + i // 60}/01/01 10:00",
+            "end_time": f"20{20 + i // 60}/01/21 14:59",
+            "five_stars": [f"「历史五星{i:03d}(风)」"],
+            "four_stars": [f"「历史四星{i:03d}{n}(水)」" for n in range(3)],
+        })
+    return entries
+
+
+def build_genshin_pages(snapshot):
+    year = snapshot_year(snapshot)
+    history = [e for e in snapshot["gacha_data"] if e["type"] != "混池（集录）"]
+    chronicled = [e for e in snapshot["gacha_data"] if e["type"] == "混池（集录）"]
+    history += genshin_filler_entries(snapshot.get("total_pools", GENSHIN_TOTAL_POOLS) - len(history) - len(chronicled))
+
+    # 往期祈愿：每个版本一个外层表格，卡池表格嵌套在单元格内
+    blocks = []
+    current_version, cells = None, []
+    for entry in history + [None]:
+        if entry is None or entry["version"] != current_version:
+            if cells:
+                blocks.append(f'<h3><span class="mw-headline">{esc(current_version)}</span></h3>\n'
+                              f'<table class="wikitable"><tr>{"".join(cells)}</tr></table>')
+            if entry is None:
+                break
+            current_version, cells = entry["version"], []
+        cells.append(f"<td>{render_genshin_table(entry, year, 'ys-qy-table')}</td>")
+    page1 = page_shell("往期祈愿", "\n".join(blocks))
+
+    tables = [render_genshin_table(entry, year, "wikitable") for entry in chronicled]
+    page2 = page_shell("集录祈愿", "<h3><span class=\"mw-headline\">集录祈愿</span></h3>\n" + "\n".join(tables))
+    return page1, page2
+
+
+# ==================== 星穹铁道 ====================
+
+def render_hsr_table(wish):
+    is_character = wish["pool_type"] == "角色池"
+    kind = "角色" if is_character else "光锥"
+    if wish["start_time"]:
+        time_text = f"{wish['start_time']} ~ {wish['end_time']}"
+    else:
+        time_text = f"常驻至 {wish['end_time']}"
+    rows = [f"<tr><th colspan=\"2\">{'角色' if is_character else '光锥'}活动跃迁</th></tr>",
+            f"<tr><th>时间</th><td>\n\t{esc(time_text)}\n</td></tr>"]
+    if wish["version"] != "未知版本":
+        rows.append(f"<tr><th>版本</th><td>{esc(wish['version'])}</td></tr>")
+    rows.append(f"<tr><th>5星{kind}</th><td>{esc(wish['five_star'])}</td></tr>")
+    if wish["four_star"]:
+        items = "<br>".join(f'<a href="/sr/{esc(i)}">{esc(i)}</a>' for i in wish["four_star"].split(", "))
+        rows.append(f"<tr><th>4星{kind}</th><td>{items}</td></tr>")
+    return '<table class="wikitable">' + "".join(rows) + "</table>"
+
+
+def hsr_filler_wishes(version):
+    wishes = []
+    for i, pool_type in enumerate(["角色池", "光锥池", "角色池", "光锥池"]):
+        wishes.append({
+            "version": version,
+            "pool_type": pool_type,
+            "start_time": f"{version}版本更新后" if i < 2 else "2024/01/01 12:00",
+            "end_time": "2024/01/21 15:00",
+            "five_star": f"历史{version}-{i}（巡猎•物理）",
+            "four_star": ", ".join(f"历史四星{version}-{i}-{n}（同谐•火）" for n in range(3)),
+        })
+    return wishes
+
+
+def build_hsr_page(snapshot):
+    groups = []
+    for wish in snapshot["wish_data"]:
+        if groups and groups[-1][0] == wish["version"]:
+            groups[-1][1].append(wish)
+        else:
+            groups.append((wish["version"], [wish]))
+    groups += [(version, hsr_filler_wishes(version)) for version in HSR_FILLER_VERSIONS]
+
+    blocks = []
+    current_major = None
+    for version, wishes in groups:
+        major = version.split('.')[0]
+        if major != current_major:
+            # 大版本标题下没有表格，但计入 MAX_VERSIONS
+            blocks.append(f'<h3><span class="mw-headline" id="{major}.x">{major}.x版本</span>'
+                          f'<span class="mw-editsection">[编辑]</span></h3>')
+            current_major = major
+        blocks.append(f'<h4><span class="mw-headline" id="{esc(version)}">{esc(version)}版本</span></h4>')
+        cols = "".join(f'<div class="col-sm-6">{render_hsr_table(w)}</div>' for w in wishes)
+        blocks.append(f'<div class="row">{cols}</div>')
+    return page_shell("历史跃迁", "\n".join(blocks))
+
+
+# ==================== 绝区零 ====================
+
+def render_zzz_table(pool):
+    is_weapon = pool["type"] == "weapon"
+    kind = "音擎" if is_weapon else "代理人"
+    rows = [f'<tr><th class="ys-qy-title" colspan="2"><a href="/zzz/文件:{esc(pool["name"])}.png" class="image" '
+            f'title="{esc(pool["name"])}"><img alt="{esc(pool["name"])}.png" src="/images/zzz/pool.png"></a></th></tr>']
+    if "time" in pool:
+        rows.append(f"<tr><th>时间</th><td>{esc(pool['time'])}</td></tr>")
+    if "version" in pool:
+        rows.append(f"<tr><th>版本</th><td>{esc(pool['version'])}</td></tr>")
+    if "up_s" in pool:
+        items = "".join(f'<a href="/zzz/{esc(i)}">{esc(i)}</a>' for i in pool["up_s"])
+        rows.append(f"<tr><th>S级{kind}</th><td>{items}</td></tr>")
+    if "up_a" in pool:
+        items = "".join(f'<a href="/zzz/{esc(i)}">{esc(i)}</a>' for i in pool["up_a"])
+        rows.append(f"<tr><th>A级{kind}</th><td>{items}</td></tr>")
+    return '<table class="wikitable">' + "".join(rows) + "</table>"
+
+
+def zzz_filler_versions():
+    blocks = []
+    for version in ZZZ_FILLER_VERSIONS:
+        for phase in ("下半", "上半"):
+            pools = []
+            for i, pool_type in enumerate(["character", "weapon", "character", "weapon"]):
+                signal = "独家频段" if pool_type == "character" else "音擎频段"
+                pools.append({
+                    "type": pool_type,
+                    "name": f"「历史样本{version}{phase}{i}」{signal}",
+                    "time": "2024/07/04 12:00:00 ~ 2024/07/23 14:59:59",
+                    "version": f"{version}{phase}",
+                    "up_s": [f"历史S级{version}{phase}{i}（强攻·物理）"],
+                    "up_a": [f"历史A级{version}{phase}{i}-{n}（支援·电）" for n in range(2)],
+                })
+            blocks.append({"version": version, "phase": phase, "pools": pools})
+    return blocks
+
+
+def build_zzz_page(snapshot):
+    sections = []
+    for block in snapshot + zzz_filler_versions():
+        title = f"{block['version']}·{block['phase']}" if block["phase"] != "未知" else f"{block['version']}·版本"
+        cells = "".join(f"<td>{render_zzz_table(pool)}</td>" for pool in block["pools"])
+        sections.append(f'<h3><span class="mw-headline">{esc(title)}</span></h3>\n'
+                        f'<p>{esc(title)}期间开放的调频。</p>\n'
+                        f'<table class="wikitable"><tr>{cells}</tr></table>')
+    return page_shell("往期调频", "\n".join(sections))
+
+
+# ==================== 入口 ====================
+
+def build_from_snapshots():
+    """根据快照生成全部样本页面"""
+    page1, page2 = build_genshin_pages(load_snapshot_json("genshin"))
+    return {
+        app.GENSHIN_HISTORY_PATH: page1,
+        app.GENSHIN_CHRONICLED_PATH: page2,
+        app.HSR_HISTORY_PATH: build_hsr_page(load_snapshot_json("hsr")),
+        app.ZZZ_HISTORY_PATH: build_zzz_page(load_snapshot_json("zzz")),
+    }
+
+
+def record_live_pages():
+    """从维基录制真实页面"""
+    return {path: app.fetch_page(app.wiki_url(path))["content"] for path in FIXTURE_FILES}
+
+
+def write_recorded_expected():
+    """用当前解析器解析录制的页面，结果写入 recorded/expected.json"""
+    from benchmark import GAMES, golden_view, load_recorded_pages, parse_pages
+
+    year = datetime.now().year
+    games = {game: golden_view(game, parse_pages(game, load_recorded_pages(game), year=year)) for game in GAMES}
+    expected = {"recorded_at": datetime.now().isoformat(timespec='seconds'), "year": year, "games": games}
+    with open(RECORDED_EXPECTED, 'w', encoding='utf-8') as f:
+        json.dump(expected, f, ensure_ascii=False, indent=1)
+        f.write("\n")
+    print(f"已写入 {os.path.relpath(RECORDED_EXPECTED, FIXTURE_DIR)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成解析器样本页面')
+    parser.add_argument('--record', action='store_true', help='从维基录制真实页面到 fixtures/recorded/')
+    args = parser.parse_args()
+
+    if args.record:
+        os.makedirs(RECORDED_DIR, exist_ok=True)
+        pages, target = record_live_pages(), recorded_path
+    else:
+        pages, target = build_from_snapshots(), fixture_path
+    for path, content in pages.items():
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        with open(target(path), 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0) if args.record else content)
+        print(f"已写入 {os.path.relpath(target(path), FIXTURE_DIR)} ({len(content)} 字节)")
+    if args.record:
+        write_recorded_expected()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""端到端压测
+
+以指定并发持续请求服务接口，报告每个接口的吞吐量和 p50/p95/p99 延迟。
+加 --spawn 时自动启动模拟维基（fixtures/fake_wiki.py）和服务进程，全程不访问真实维基。
+
+    python loadtest.py --spawn                            # 启动 app.py 并压测默认接口
+    python loadtest.py --spawn --server serve --workers 2 # 压测多进程部署
+    python loadtest.py --spawn --wiki-latency 0.5 --wiki-error-rate 0.2 --cache-ttl 1
+    python loadtest.py --base-url http://127.0.0.1:5000 -c 32 -d 30
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_ENDPOINTS = ["/api/genshin", "/api/hsr", "/api/zzz", "/api/all", "/health"]
+
+
+def free_port():
+    """向系统申请一个空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url, timeout=30):
+    """等待服务可以响应请求"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"等待 {url} 启动超时")
+
+
+def spawn_stack(args, workdir):
+    """启动模拟维基和服务进程，返回 (服务地址, 进程列表)
+
+    服务使用临时目录保存页面缓存和快照，不读写仓库中的快照和历史数据库，
+    因此第一次请求会经过完整的抓取和解析。
+    """
+    wiki_port, app_port = free_port(), free_port()
+    wiki_cmd = [sys.executable, os.path.join(ROOT_DIR, "fixtures", "fake_wiki.py"), "--port", str(wiki_port),
+                "--latency", str(args.wiki_latency), "--jitter", str(args.wiki_jitter),
+                "--error-rate", str(args.wiki_error_rate)]
+    env = dict(os.environ,
+               GACHA_WIKI_BASE_URL=f"http://127.0.0.1:{wiki_port}",
+               GACHA_PAGE_CACHE_DIR=os.path.join(workdir, "page_cache"),
+               GACHA_HISTORY_DB="")
+    if args.server == "serve":
+        app_cmd = [sys.executable, os.path.join(ROOT_DIR, "serve.py"), "--host", "127.0.0.1", "--port", str(app_port),
+                   "--workers", str(args.workers), "--cache-dir", os.path.join(workdir, "serve_cache")]
+    else:
+        app_cmd = [sys.executable, os.path.join(ROOT_DIR, "app.py"), "--host", "127.0.0.1", "--port", str(app_port),
+                   "--snapshot-dir", workdir, "--cache-ttl", str(args.cache_ttl), "--no-scheduler"]
+
+    output = None if args.verbose else subprocess.DEVNULL
+    processes = [subprocess.Popen(wiki_cmd, stdout=output, stderr=output)]
+    wait_ready(f"http://127.0.0.1:{wiki_port}/__fault")
+    processes.append(subprocess.Popen(app_cmd, env=env, stdout=output, stderr=output))
+    base_url = f"http://127.0.0.1:{app_port}"
+    wait_ready(base_url + "/health")
+    return base_url, processes
+
+
+def percentile(sorted_values, fraction):
+    """最近秩百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def run_load(base_url, endpoints, concurrency, duration, max_requests=None, timeout=30):
+    """以 concurrency 个线程轮流请求 endpoints，返回 ([(接口, 状态, 耗时秒)], 实际持续时间)"""
+    samples = []
+    samples_lock = threading.Lock()
+    counter = iter(range(max_requests)) if max_requests else None
+    stop = time.monotonic() + duration
+
+    def worker(offset):
+        session = requests.Session()
+        local = []
+        position = offset
+        while time.monotonic() < stop:
+            if counter is not None and next(counter, None) is None:
+                break
+            endpoint = endpoints[position % len(endpoints)]
+            position += 1
+            start = time.perf_counter()
+            try:
+                status = session.get(base_url + endpoint, timeout=timeout).status_code
+            except requests.RequestException:
+                status = "error"
+            local.append((endpoint, status, time.perf_counter() - start))
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed, endpoints):
+    """按接口汇总请求数、错误数、吞吐量和延迟百分位，最后一行为全部接口合计"""
+    groups = {endpoint: [] for endpoint in endpoints}
+    for endpoint, status, latency in samples:
+        groups.setdefault(endpoint, []).append((status, latency))
+    groups["全部"] = [(status, latency) for _, status, latency in samples]
+
+    results = []
+    for endpoint, entries in groups.items():
+        latencies = sorted(latency for _, latency in entries)
+        errors = sum(1 for status, _ in entries if status == "error" or status >= 400)
+        results.append({
+            "endpoint": endpoint,
+            "requests": len(entries),
+            "errors": errors,
+            "rps": len(entries) / elapsed if elapsed else 0.0,
+            "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": latencies[-1] * 1000 if latencies else 0.0,
+        })
+    return results
+
+
+def print_table(results):
+    columns = [("endpoint", "接口", "{}"), ("requests", "请求数", "{:,}"), ("errors", "错误", "{:,}"),
+               ("rps", "请求/秒", "{:.1f}"), ("mean_ms", "平均ms", "{:.1f}"),
+               ("p50_ms", "p50ms", "{:.1f}"), ("p95_ms", "p95ms", "{:.1f}"),
+               ("p99_ms", "p99ms", "{:.1f}"), ("max_ms", "最大ms", "{:.1f}")]
+    rows = [[fmt.format(r[key]) for key, _, fmt in columns] for r in results]
+    widths = [max(len(title), *(len(row[i]) for row in rows)) for i, (_, title, _) in enumerate(columns)]
+    print("  ".join(title.ljust(w) for (_, title, _), w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(cell.ljust(w) for cell, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端压测')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000', help='服务地址（--spawn 时忽略）')
+    parser.add_argument('--endpoints', nargs='+', default=DEFAULT_ENDPOINTS, help='要请求的接口路径')
+    parser.add_argument('-c', '--concurrency', type=int, default=16, help='并发请求数')
+    parser.add_argument('-d', '--duration', type=float, default=10, help='压测持续时间（秒）')
+    parser.add_argument('-n', '--requests', type=int, help='总请求数上限')
+    parser.add_argument('--warmup', type=int, default=1, help='正式压测前每个接口预先请求的次数')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求超时（秒）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 输出结果')
+    parser.add_argument('--spawn', action='store_true', help='启动模拟维基和服务进程后再压测')
+    parser.add_argument('--server', choices=['app', 'serve'], default='app', help='--spawn 时启动的服务')
+    parser.add_argument('--workers', type=int, default=2, help='--server serve 时的工作进程数')
+    parser.add_argument('--cache-ttl', type=int, default=600, help='--server app 时的缓存有效期（秒）')
+    parser.add_argument('--wiki-latency', type=float, default=0, help='模拟维基的响应延迟（秒）')
+    parser.add_argument('--wiki-jitter', type=float, default=0, help='模拟维基的随机延迟上限（秒）')
+    parser.add_argument('--wiki-error-rate', type=float, default=0, help='模拟维基返回错误的概率')
+    parser.add_argument('-v', '--verbose', action='store_true', help='显示被启动进程的输出')
+    args = parser.parse_args()
+
+    processes = []
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            base_url = args.base_url.rstrip('/')
+            if args.spawn:
+                base_url, processes = spawn_stack(args, workdir)
+            for endpoint in args.endpoints:
+                for _ in range(args.warmup):
+                    try:
+                        requests.get(base_url + endpoint, timeout=args.timeout)
+                    except requests.RequestException as e:
+                        print(f"预热 {endpoint} 失败: {e}", file=sys.stderr)
+
+            samples, elapsed = run_load(base_url, args.endpoints, args.concurrency, args.duration,
+                                        args.requests, args.timeout)
+        finally:
+            for process in reversed(processes):
+                process.terminate()
+            for process in processes:
+                process.wait()
+
+    results = summarize(samples, elapsed, args.endpoints)
+    if args.json:
+        print(json.dumps({"concurrency": args.concurrency, "elapsed": elapsed, "results": results},
+                         ensure_ascii=False, indent=2))
+    else:
+        print(f"并发 {args.concurrency}，持续 {elapsed:.1f} 秒")
+        print_table(results)
+    return 1 if any(r["errors"] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
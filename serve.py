@@ -0,0 +1,380 @@
+"""多进程生产服务入口
+
+主进程只负责 fork 和监控子进程，自身不启动任何线程，保证 fork 出的子进程不会继承
+被其他线程持有的锁。刷新进程定时抓取数据，把结果原子写入共享缓存目录（文件布局与仓库中的
+快照相同，旁边附带预先压缩好的各种编码），并把变更记录写入历史数据库。工作进程共享同一个
+监听套接字，以快照模式读取缓存目录并直接映射编码文件：后台线程发现文件修改时间变化时重新加载，
+并从数据库读取变更推送给事件订阅者，因此 N 个工作进程只抓取一次维基页面、只压缩一次响应，
+变更版本号在所有工作进程中一致。
+
+    python serve.py                              # 工作进程数 = CPU 核数
+    python serve.py --workers 4 --threads 16     # 4 个进程，每个进程 16 个处理线程
+    python serve.py --no-refresh                 # 只提供仓库中已提交的快照
+"""
+import argparse
+import io
+import json
+import os
+import queue
+import selectors
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+import app
+
+EVENT_STREAM_PATH = "/api/events"
+KEEPALIVE_TIMEOUT = 5  # 长连接空闲以及单次读写阻塞的最长时间（秒），超时后关闭连接
+
+
+class ConnectionDetached(Exception):
+    """连接已转交给单独的线程，线程池中的线程不再处理它"""
+
+
+class PooledRequestHandler(WSGIRequestHandler):
+    """由 PooledWSGIServer 逐个请求调度的请求处理器
+    
+    每次只处理一个请求，之后连接交回服务器等待下一个请求。werkzeug 总是关闭连接，并在响应后
+    把套接字上剩余的数据当作未读的请求体读掉；这里对没有请求体的 HTTP/1.1 请求保持长连接，
+    并让这一步读取一个空的输入，不会吞掉客户端紧接着发来的下一个请求。
+    事件推送请求在读完请求头后转交给单独的线程（见 PooledWSGIServer.detach）。
+    """
+    timeout = KEEPALIVE_TIMEOUT
+    detached = False
+
+    @classmethod
+    def open(cls, request, client_address, server):
+        """为新连接创建处理器（不像 BaseRequestHandler 那样在构造时处理请求）"""
+        handler = cls.__new__(cls)
+        handler.request = request
+        handler.client_address = client_address
+        handler.server = server
+        handler.setup()
+        return handler
+
+    def handle_request(self):
+        """处理连接上的下一个请求，返回连接是否可以继续使用"""
+        self.close_connection = True
+        try:
+            self.handle_one_request()
+        except (ConnectionError, socket.timeout) as e:
+            self.connection_dropped(e)
+            return False
+        return not self.close_connection
+
+    def keep_alive_allowed(self):
+        return (self.request_version == "HTTP/1.1" and "Transfer-Encoding" not in self.headers
+                and self.headers.get("Content-Length", "0") == "0")
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "connection" and value.lower() == "close" and self.keep_alive_allowed():
+            return
+        super().send_header(keyword, value)
+
+    def make_environ(self):
+        environ = super().make_environ()
+        if self.keep_alive_allowed():
+            # environ 已持有真实的输入，响应后的排空只看到一个立即可读的空输入
+            self.connection, self.rfile = self.server.drained_socket, io.BytesIO()
+        return environ
+
+    def run_wsgi(self):
+        if not self.detached and urlsplit(self.path).path == EVENT_STREAM_PATH:
+            # 先标记再转交，接手的线程开始处理后本线程不再触碰连接
+            self.detached = True
+            if self.server.detach(self):
+                raise ConnectionDetached
+            self.detached = False
+        connection, rfile = self.connection, self.rfile
+        try:
+            super().run_wsgi()
+        finally:
+            self.connection, self.rfile = connection, rfile
+
+    def serve_detached(self):
+        """在接手的线程中处理已读完请求头的事件推送请求"""
+        try:
+            self.run_wsgi()
+            self.wfile.flush()
+        except (ConnectionError, socket.timeout) as e:
+            self.connection_dropped(e)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """用固定大小的线程池处理请求的 WSGI 服务器
+    
+    等待请求的连接（新连接和长连接）由一个线程统一监视，收到数据后才交给线程池处理一个请求，
+    空闲连接不占用线程池，空闲超过 KEEPALIVE_TIMEOUT 秒后关闭。
+    事件推送（/api/events）的连接会一直保持，转交给单独的线程处理，不占用线程池；
+    单独线程的数量以 app.SSE_MAX_SUBSCRIBERS 为上限，超出时留在线程池中，由接口返回 503。
+    """
+    multithread = True
+    daemon_threads = True
+
+    def __init__(self, host, port, wsgi_app, threads, fd):
+        super().__init__(host, port, wsgi_app, handler=PooledRequestHandler, fd=fd)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="gacha-http")
+        self.stream_slots = threading.BoundedSemaphore(app.SSE_MAX_SUBSCRIBERS)
+        # 等待请求的连接先放入 parked，由监视线程注册到 selector（selector 只在监视线程中使用）
+        self.parked = queue.SimpleQueue()
+        self.selector = selectors.DefaultSelector()
+        self.wakeup_recv, self.wakeup_send = socket.socketpair()
+        self.wakeup_recv.setblocking(False)
+        # 始终可读的套接字，供 PooledRequestHandler.make_environ 使用
+        self.drained_socket, self.drained_peer = socket.socketpair()
+        self.drained_peer.send(b"\0")
+        self.selector.register(self.wakeup_recv, selectors.EVENT_READ)
+        threading.Thread(target=self._watch_connections, name="gacha-keepalive", daemon=True).start()
+
+    def process_request(self, request, client_address):
+        try:
+            handler = self.RequestHandlerClass.open(request, client_address, self)
+        except Exception:
+            self.handle_error(request, client_address)
+            self.shutdown_request(request)
+            return
+        self._park(handler)
+
+    def _park(self, handler):
+        self.parked.put(handler)
+        self.wakeup_send.send(b"\0")
+
+    def _watch_connections(self):
+        idle_since = {}
+        while True:
+            for key, _ in self.selector.select(timeout=1):
+                if key.data is None:
+                    self.wakeup_recv.recv(4096)
+                    continue
+                self.selector.unregister(key.fileobj)
+                del idle_since[key.data]
+                self.executor.submit(self._handle_request, key.data)
+            now = time.monotonic()
+            while not self.parked.empty():
+                handler = self.parked.get()
+                self.selector.register(handler.connection, selectors.EVENT_READ, handler)
+                idle_since[handler] = now
+            for handler, since in list(idle_since.items()):
+                if now - since > KEEPALIVE_TIMEOUT:
+                    self.selector.unregister(handler.connection)
+                    del idle_since[handler]
+                    self._close(handler)
+
+    def _handle_request(self, handler):
+        try:
+            keep_alive = handler.handle_request()
+        except ConnectionDetached:
+            return
+        except Exception:
+            self.handle_error(handler.request, handler.client_address)
+            keep_alive = False
+        if keep_alive:
+            self._park(handler)
+        else:
+            self._close(handler)
+
+    def _close(self, handler):
+        try:
+            handler.finish()
+        except OSError:
+            pass
+        self.shutdown_request(handler.request)
+
+    def detach(self, handler):
+        """把请求转交给单独的线程，已达上限时返回 False"""
+        if not self.stream_slots.acquire(blocking=False):
+            return False
+        threading.Thread(target=self._process_detached, args=(handler,), name="gacha-events", daemon=True).start()
+        return True
+
+    def _process_detached(self, handler):
+        try:
+            handler.serve_detached()
+        except Exception:
+            self.handle_error(handler.request, handler.client_address)
+        finally:
+            self._close(handler)
+            self.stream_slots.release()
+
+
+def create_listen_socket(host, port, backlog):
+    """创建所有工作进程共用的监听套接字"""
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def write_shared_snapshot(cache_dir, game, data):
+    """把刷新后的数据原子写入共享缓存目录，内容未变化时不写，避免工作进程无谓地重新加载
+    
+    各种编码先于快照写入，工作进程加载快照时直接映射，不必各自压缩。
+    预热用的快照本来就读自缓存目录，不写回。
+    """
+    if app.is_error_result(data) or app.is_seeded_data(game, data):
+        return
+    path = os.path.join(cache_dir, app.SNAPSHOT_FILES[game])
+    body = app.serialize_json(data)
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == body:
+                return
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    app.write_payload_files(path, app.build_payload(data, body=body, brotli_quality=app.SNAPSHOT_BROTLI_QUALITY))
+    app._atomic_write(path, body)
+    write_shared_all(cache_dir)
+
+
+def write_shared_all(cache_dir):
+    """按缓存目录中的快照生成 /api/all 的各种编码，与工作进程拼接出的响应一致"""
+    snapshots = {}
+    for game, name in app.SNAPSHOT_FILES.items():
+        try:
+            with open(os.path.join(cache_dir, name), 'rb') as f:
+                mtime = os.fstat(f.fileno()).st_mtime
+                body = f.read()
+        except OSError:
+            return
+        snapshots[game] = {"mtime": mtime, "body": body, "data": json.loads(body)}
+    data, mtime, body = app.combine_snapshots(snapshots)
+    path = os.path.join(cache_dir, app.ALL_PAYLOAD_FILE)
+    if app.map_payload_files(path, data, mtime, body) is None:
+        app.write_payload_files(path, app.build_payload(data, mtime, body, app.SNAPSHOT_BROTLI_QUALITY))
+
+
+def seed_cache_dir(cache_dir):
+    """缓存目录中缺少的游戏先用仓库中已提交的快照填充，工作进程启动即可提供数据
+    
+    已有的快照缺少编码文件时（例如由旧版本写入）补上。
+    """
+    for game in app.GAME_FETCHERS:
+        path = os.path.join(cache_dir, app.SNAPSHOT_FILES[game])
+        try:
+            with open(path, 'rb') as f:
+                body = f.read()
+        except OSError:
+            data = app.load_previous_snapshot(game)
+            if data is not None:
+                write_shared_snapshot(cache_dir, game, data)
+            continue
+        try:
+            data = json.loads(body)
+        except ValueError:
+            continue
+        if app.map_payload_files(path, data, None, body) is None:
+            app.write_payload_files(path, app.build_payload(data, body=body,
+                                                            brotli_quality=app.SNAPSHOT_BROTLI_QUALITY))
+    write_shared_all(cache_dir)
+
+
+def run_worker(sock, cache_dir, threads):
+    """工作进程：快照模式，从共享缓存目录读取数据"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    app.SERVE_SNAPSHOTS = True
+    app.SNAPSHOT_DIR = cache_dir
+    app.HISTORY_DB_READONLY = True
+    app.load_all_snapshots()
+    app.start_snapshot_watcher()
+    host, port = sock.getsockname()[:2]
+    server = PooledWSGIServer(host, port, app.app, threads, sock.fileno())
+    server.serve_forever()
+
+
+def run_refresher(cache_dir):
+    """刷新进程：定时抓取数据写入共享缓存目录，直到收到 SIGTERM"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # 从共享缓存目录预热（其中是上次刷新的结果），而不是仓库中已提交的快照
+    app.SNAPSHOT_DIR = cache_dir
+    app.on_data_refresh(lambda game, data: write_shared_snapshot(cache_dir, game, data))
+    app.warm_start_from_snapshots()
+    app.start_scheduler()
+    while True:
+        signal.pause()
+
+
+def spawn_process(target, *args):
+    """fork 一个子进程运行 target，返回其 pid
+    
+    只在主进程中调用，主进程不启动线程，子进程不会继承被其他线程持有的锁。
+    """
+    sys.stdout.flush()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            target(*args)
+        finally:
+            os._exit(1)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description='卡池追踪器多进程服务')
+    parser.add_argument('--host', type=str, default='0.0.0.0', help='服务器主机地址')
+    parser.add_argument('--port', type=int, default=5000, help='服务器端口')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='工作进程数')
+    parser.add_argument('--threads', type=int, default=8, help='每个工作进程的请求处理线程数')
+    parser.add_argument('--backlog', type=int, default=1024, help='监听队列长度')
+    parser.add_argument('--cache-dir', type=str, default=os.path.join(app.SNAPSHOT_DIR, ".serve_cache"),
+                        help='主进程与工作进程共享的数据目录')
+    parser.add_argument('--no-refresh', action='store_true', help='主进程不刷新数据，只提供已提交的快照')
+    args = parser.parse_args()
+
+    cache_dir = os.path.abspath(args.cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    seed_cache_dir(cache_dir)
+    sock = create_listen_socket(args.host, args.port, args.backlog)
+
+    # 子进程: pid -> (名称, 入口, 参数)，退出时按原样重新启动
+    roles = [("工作进程", run_worker, (sock, cache_dir, args.threads))] * args.workers
+    if not args.no_refresh:
+        roles.append(("刷新进程", run_refresher, (cache_dir,)))
+    children = {spawn_process(target, *target_args): (name, target, target_args)
+                for name, target, target_args in roles}
+    print(f"启动卡池追踪器服务器: http://{args.host}:{args.port} "
+          f"（{args.workers} 个工作进程，每个 {args.threads} 个线程，共享目录 {cache_dir}）", flush=True)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    # 监控子进程，异常退出时重新启动
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        role = children.pop(pid, None)
+        if role is not None and not stopping:
+            name, target, target_args = role
+            print(f"{name} {pid} 退出（状态 {status}），重新启动", flush=True)
+            time.sleep(1)
+            children[spawn_process(target, *target_args)] = role
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())